@@ -1,7 +1,7 @@
 // Dashboard.tsx - The main dashboard component
 import React, { useEffect, useState } from 'react';
 import { Statistics, Grievance } from '@/lib/types';
-import { statisticsApi, grievanceApi } from '@/lib/api';
+import { statisticsApi, grievanceApi, eventsApi } from '@/lib/api';
 import {
   Chart as ChartJS,
   CategoryScale,
@@ -52,9 +52,9 @@ const Dashboard: React.FC = () => {
 
 
   useEffect(() => {
-    const fetchDashboardData = async () => {
+    const fetchDashboardData = async (showLoading = true) => {
       try {
-        setLoading(true);
+        if (showLoading) setLoading(true);
 
         // Fetch statistics
         const statsResponse = await statisticsApi.getStatistics();
@@ -87,6 +87,18 @@ const Dashboard: React.FC = () => {
     fetchUser();
 
     fetchDashboardData();
+
+    // Refresh on pushed changes instead of polling; bursts of events trigger a single refresh
+    let refreshTimer: ReturnType<typeof setTimeout> | undefined;
+    const events = eventsApi.subscribe(() => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => fetchDashboardData(false), 1000);
+    });
+
+    return () => {
+      clearTimeout(refreshTimer);
+      events.close();
+    };
   }, []);
 
   // Prepare chart data
@@ -1,7 +1,7 @@
 // api.ts - API service for making requests to the backend
 
 import axios from 'axios';
-import { Grievance, Statistics, User, Comment, Attachment, ApiResponse, NewGrievanceFormData } from './types';
+import { Grievance, Statistics, Trends, User, Comment, Attachment, ApiResponse, NewGrievanceFormData } from './types';
 
 
 // Create axios instance
@@ -178,6 +178,62 @@ export const grievanceApi = {
 export const statisticsApi = {
   getStatistics: () => 
     api.get<ApiResponse<Statistics>>('/statistics'),
+  getTrends: (params: { from?: string; to?: string; group_by?: Trends['group_by']; interval?: Trends['interval'] } = {}) =>
+    api.get<Trends>('/statistics/trends', { params }),
+};
+
+// Live change feed (Server-Sent Events). The browser resumes from Last-Event-ID on reconnect.
+export const CHANGE_EVENT_TYPES = ['grievance.created', 'grievance.updated', 'grievance.escalated', 'comment.created', 'attachment.created'];
+
+// EventSource gives up for good on any non-200 response (e.g. a 503 when the server's stream
+// cap is reached) and ignores Retry-After, so such streams are reopened here with backoff
+const EVENT_RETRY_MIN_MS = 5000;
+const EVENT_RETRY_MAX_MS = 60000;
+
+export const eventsApi = {
+  subscribe: (onEvent: (event: MessageEvent) => void) => {
+    let source: EventSource | undefined;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let retryDelay = EVENT_RETRY_MIN_MS;
+    let lastEventId = '';
+    let closed = false;
+
+    const handleEvent = (event: Event) => {
+      const message = event as MessageEvent;
+      if (message.lastEventId) {
+        lastEventId = message.lastEventId;
+      }
+      onEvent(message);
+    };
+
+    const open = () => {
+      const token = localStorage.getItem('token') ?? '';
+      const resume = lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : '';
+      const current = new EventSource(`${api.defaults.baseURL}/events?token=${encodeURIComponent(token)}${resume}`);
+      source = current;
+      CHANGE_EVENT_TYPES.forEach(type => current.addEventListener(type, handleEvent));
+      current.onopen = () => {
+        retryDelay = EVENT_RETRY_MIN_MS;
+      };
+      current.onerror = () => {
+        // CONNECTING means the browser is already retrying on its own
+        if (closed || current.readyState !== EventSource.CLOSED) {
+          return;
+        }
+        retryTimer = setTimeout(open, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, EVENT_RETRY_MAX_MS);
+      };
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        clearTimeout(retryTimer);
+        source?.close();
+      },
+    };
+  },
 };
 
 export default api;
\ No newline at end of file
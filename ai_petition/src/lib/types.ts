@@ -58,6 +58,20 @@ export interface User {
     recent_grievances: Array<GrievanceSummary>;
   }
   
+  export interface TrendSeries {
+    key: string;
+    opened: number[];
+    closed: number[];
+  }
+  
+  export interface Trends {
+    interval: 'day' | 'week' | 'month';
+    group_by: 'category' | 'priority' | 'department' | null;
+    buckets: string[];
+    series: TrendSeries[];
+    totals: { opened: number[]; closed: number[] };
+  }
+  
   export interface GrievanceSummary {
     id: number;
     title: string;
@@ -1,5 +1,6 @@
 import sqlite3
-import uuid
+import db
+import ids
 from werkzeug.security import generate_password_hash
 
 DATABASE_NAME = 'grievance_system.db'
@@ -23,7 +24,7 @@ def create_admin_account():
         return
     
     # Admin details
-    admin_id = str(uuid.uuid4())
+    admin_id = ids.new_id()
     admin_name = "Admin User"
     admin_email = "admin@petition.ai"
     admin_password = generate_password_hash("Admin@123")  # Securely hash the password
@@ -32,8 +33,8 @@ def create_admin_account():
 
     # Insert admin into the database
     conn.execute(
-        "INSERT INTO users (id, name, email, password, role, department) VALUES (?, ?, ?, ?, ?, ?)",
-        (admin_id, admin_name, admin_email, admin_password, admin_role, admin_department)
+        "INSERT INTO users (id, name, email, password, role, department, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (admin_id, admin_name, admin_email, admin_password, admin_role, admin_department, db.now_ms())
     )
     
     conn.commit()
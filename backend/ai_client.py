@@ -0,0 +1,40 @@
+import os
+import threading
+
+# The Gemini SDK is heavy to import, so it is loaded and configured on first use
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+_lock = threading.Lock()
+_genai = None
+_models = {}
+
+def get_genai():
+    """Import and configure google.generativeai once, in a thread-safe way"""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GOOGLE_GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+def get_model(name=DEFAULT_MODEL, system_instruction=None):
+    """Return a cached GenerativeModel instance"""
+    key = (name, system_instruction)
+    model = _models.get(key)
+    if model is None:
+        genai = get_genai()
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                if system_instruction:
+                    model = genai.GenerativeModel(name, system_instruction=system_instruction)
+                else:
+                    model = genai.GenerativeModel(name)
+                _models[key] = model
+    return model
+
+def is_configured():
+    """Whether an API key is available for the AI client"""
+    return bool(os.getenv("GOOGLE_GEMINI_API_KEY"))
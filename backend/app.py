@@ -1,18 +1,38 @@
+import time
+_import_started = time.perf_counter()
+
 import base64
-from flask import Flask, abort, request, jsonify, send_from_directory
+import json
+import queue
+import threading
+from flask import Flask, Response, abort, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import uuid
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 import db
+from responses import ApiJSONProvider, compress_response, format_sse, format_timestamps, json_list_response
+from ratelimit import rate_limited
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
-import google.generativeai as genai
-
-genai.configure(api_key=os.getenv("GOOGLE_GEMINI_API_KEY"))
+import ai_client
+import prompts
+import assignment
+import events
+import sla
 
 app = Flask(__name__)
+# Number of reverse proxies in front of the app whose X-Forwarded-* headers are trusted. Behind
+# one, request.remote_addr would otherwise be the proxy and every client would share its
+# per-IP rate limits. Leave at 0 when clients connect directly, or they could spoof their address.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES,
+                            x_host=TRUSTED_PROXIES)
+# Timestamps are stored as epoch milliseconds and formatted as ISO 8601 in responses
+app.json = ApiJSONProvider(app)
 # i want to allow all origins
 CORS(app, supports_credentials=True, origins='*')
 
@@ -26,6 +46,24 @@ ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# Comment pagination, used once a caller passes ?since= or ?limit=
+COMMENT_PAGE_SIZE = 100
+MAX_COMMENT_PAGE_SIZE = 500
+
+# Trend window used when /api/statistics/trends gets no ?from=
+TRENDS_DEFAULT_DAYS = 90
+# Longest span a trends request may cover; the series is filled day by day, so this bounds the response
+TRENDS_MAX_DAYS = int(os.getenv('TRENDS_MAX_DAYS', 5 * 366))
+
+# Live event stream (SSE): clients reconnect with Last-Event-ID after EVENT_STREAM_MAX_SECONDS
+# (polling and the per-worker stream cap live in events.py)
+EVENT_HEARTBEAT_INTERVAL = 15
+EVENT_STREAM_MAX_SECONDS = 300
+EVENT_RETRY_MS = 3000
+
+# Negotiated gzip/brotli compression for JSON responses
+app.after_request(compress_response)
+
 
 def process_attachments(attachments):
     """
@@ -49,7 +87,13 @@ def process_attachments(attachments):
             print(f"Error processing attachment: {e}")
     return processed_attachments
 
+def classification_text(data, category, priority):
+    """Analysis text for a classification that did not come from the model: the caller's own title and description"""
+    return (f"Title: {data.get('title', '')}\nDescription: {data.get('description', '')}\n"
+            f"Category: {category}\nPriority: {priority}")
+
 @app.route('/api/ai-analyze-grievance', methods=['POST'])
+@rate_limited('ai')
 def analyze_grievance():
     """
     Endpoint for AI analysis of grievance data
@@ -65,66 +109,48 @@ def analyze_grievance():
         # Process attachments
         attachments = process_attachments(data.get('attachments', []))
         
-        # Predefined categories and priority levels for guidance
-        categories = [
-            "Public Infrastructure & Utilities",
-            "Government Services & Administration",
-            "Consumer Rights & Product Issues",
-            "Workplace & Employment Issues",
-            "Education & Student Concerns",
-            "Healthcare & Medical Services",
-            "Law Enforcement & Justice",
-            "Environmental & Safety Issues",
-            "Housing & Real Estate",
-            "Transportation & Public Safety",
-            "Financial & Banking Issues",
-            "Other"
-        ]
-
-        
-        priority_levels = [
-            "Low - Minor issue, no immediate action required", 
-            "Medium - Requires attention within a week", 
-            "High - Needs immediate investigation", 
-            "Critical - Urgent action required"
-        ]
-        
-        # Prepare prompt for Gemini with specific instructions for category and priority
-        prompt = f"""Analyze this grievance and provide structured recommendations:
-
-Grievance Details:
-- Title: {data.get('title', 'N/A')}
-- Description: {data.get('description', 'N/A')}
-- Attachments: {len(attachments)} file(s)
-
-Available Categories: {', '.join(categories)}
-Available Priority Levels: {', '.join(priority_levels)}
-
-Instructions:
-1. Carefully review the grievance description
-2. Select the MOST APPROPRIATE category from the provided list
-3. Determine the MOST SUITABLE priority level based on the grievance's urgency and impact
-4. Provide a clear rationale for your category and priority selection
-
-Please provide recommendations in the following structured format:
-Title: [Refined Title]
-Description: [Improved Description (limited to 500 words)]
-Category: [Selected Category] 
-Priority: [Selected Priority Level]
-Rationale: 
-- Why this category was chosen
-- Why this priority level was selected
-
-Key Observations: 
-1. [Observation 1]
-2. [Observation 2]
-3. [Observation 3]
-
-Recommendations should be concise, clear, and directly actionable."""
-        
-        # Use Gemini Pro model for text generation
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        # Routine submissions are classified locally when the model is confident enough
+        # (classifier and trends load NumPy, so they are imported by the routes that use them)
+        import classifier
+        local = classifier.classify(data.get('title', ''), data.get('description', ''))
+        if local:
+            return jsonify({
+                "text": classification_text(data, local['category'], local['priority']),
+                "category": local['category'],
+                "priority": local['priority'],
+                "raw_response": None,
+                "reused": False,
+                "source": "local",
+                "confidence": local['confidence']
+            })
+        
+        # Compact, budgeted prompt; mode "classify" asks only for category and priority
+        mode = prompts.MODE_CLASSIFY if data.get('mode') == prompts.MODE_CLASSIFY else prompts.MODE_FULL
+        
+        # Reuse the classification of a near-identical earlier submission in the same mode instead of
+        # calling the model. Only category and priority carry over: that analysis's text rewrites
+        # someone else's title and description and must never be returned to this caller.
+        previous = db.find_reusable_analysis(data.get('title', ''), data.get('description', ''), mode)
+        if previous:
+            return jsonify({
+                "text": classification_text(data, previous['category'], previous['priority']),
+                "category": previous['category'],
+                "priority": previous['priority'],
+                "raw_response": None,
+                "reused": True,
+                "similarity": previous['similarity']
+            })
+        
+        prompt, prompt_info = prompts.build_prompt(data.get('title'), data.get('description'), len(attachments), mode)
+        
+        # Use Gemini Pro model for text generation (client is initialized on first use)
+        model = ai_client.get_model(system_instruction=prompts.SYSTEM_INSTRUCTION)
+        started = time.perf_counter()
+        response = model.generate_content(prompt, generation_config=prompts.generation_config(mode))
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        input_tokens, output_tokens = prompts.usage_tokens(response, prompt, prompt_info)
+        db.record_ai_usage(mode, input_tokens, output_tokens, latency_ms)
         
         # Extract category and priority from the response
         try:
@@ -136,12 +162,21 @@ Recommendations should be concise, clear, and directly actionable."""
             category = None
             priority = None
         
+        db.save_ai_analysis(data.get('title', ''), data.get('description', ''), response.text, category, priority, mode)
+        
         # Return the AI-generated analysis
         return jsonify({
             "text": response.text,
             "category": category,
             "priority": priority,
-            "raw_response": str(response)
+            "raw_response": str(response),
+            "reused": False,
+            "usage": {
+                "mode": mode,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "truncated": prompt_info['truncated']
+            }
         })
     
     except Exception as e:
@@ -157,17 +192,102 @@ def health_check():
     """Simple health check endpoint"""
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: this worker has finished startup, the database accepts writes
+    and the AI client is configured. Returns 503 until every check passes.
+    """
+    checks = {"worker": bool(app.config.get('STARTUP_REPORT'))}
+    
+    try:
+        checks["database"] = db.check_writable()
+    except Exception as e:
+        app.logger.warning(f"Readiness database check failed: {e}")
+        checks["database"] = False
+    
+    checks["ai"] = ai_client.is_configured()
+    
+    ready = all(checks.values())
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), 200 if ready else 503
+
+def init_worker():
+    """
+    Per-process startup: upload folder, in-memory state such as the assignment heaps, and
+    the SLA escalation scheduler thread.
+    The production server (server.py) runs this in every worker after the fork.
+    """
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    assignment.rebuild()
+    if sla.SLA_SCHEDULER_ENABLED:
+        sla.start()
+
+_startup_lock = threading.Lock()
+
+def create_app(run_setup=True):
+    """
+    Run startup work and return the app. `run_setup=False` skips schema setup for
+    workers whose master has already done it (see server.py).
+    WSGI servers can also load `app:create_app()`; it is safe to call more than once.
+    """
+    if app.config.get('STARTUP_REPORT'):
+        return app
+    
+    with _startup_lock:
+        if app.config.get('STARTUP_REPORT'):
+            return app
+        
+        setup_started = time.perf_counter()
+        if run_setup:
+            db.init_db()
+        init_worker()
+        setup_finished = time.perf_counter()
+        
+        report = {
+            "import_ms": round((setup_started - _import_started) * 1000, 1),
+            "setup_ms": round((setup_finished - setup_started) * 1000, 1),
+            "total_ms": round((setup_finished - _import_started) * 1000, 1)
+        }
+        app.config['STARTUP_REPORT'] = report
+    print(f"Startup completed in {report['total_ms']} ms "
+          f"(imports {report['import_ms']} ms, setup {report['setup_ms']} ms)")
+    return app
+
 @app.before_request
-def setup():
-    if not hasattr(app, 'setup_done'):
-        db.init_db()
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        app.setup_done = True  # Ensures it runs only once
+def ensure_started():
+    """One-time fallback for entry points that never call create_app() (`flask run`, `gunicorn app:app`)"""
+    if not app.config.get('STARTUP_REPORT'):
+        create_app()
 
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def requested_fields():
+    """Parse the comma-separated `fields` query parameter (sparse fieldsets)"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+def parse_time_param(name):
+    """
+    Parse a time query parameter given as epoch milliseconds or ISO 8601
+    (naive values are taken as UTC). Returns epoch ms or None; raises ValueError if malformed.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' time: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
 def get_ai_insights(grievance_text):
     return "AI summary", "AI recommendation"
 
@@ -179,8 +299,15 @@ def generate_token(user_id):
     }
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
-def token_required(f):
-    """Decorator to check for valid token"""
+def token_required(f=None, allow_query_token=False):
+    """
+    Decorator to check for valid token. `token_required(allow_query_token=True)` also accepts
+    `?token=`, for EventSource clients that cannot send headers; keep that to the event stream,
+    since query strings end up in access logs and browser history.
+    """
+    if f is None:
+        return lambda f: token_required(f, allow_query_token)
+    
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
@@ -188,6 +315,8 @@ def token_required(f):
         
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
+        elif allow_query_token and request.args.get('token'):
+            token = request.args.get('token')
         
         if not token:
             return jsonify({"error": "Token is missing"}), 401
@@ -211,6 +340,7 @@ def token_required(f):
 
 # User authentication routes
 @app.route('/api/users/register', methods=['POST'])
+@rate_limited('auth')
 def register():
     data = request.json
     
@@ -236,6 +366,9 @@ def register():
     if error:
         return jsonify({"error": error}), 400
     
+    if user['role'].lower() == 'staff':
+        assignment.rebuild()
+    
     # Generate token for new user
     token = generate_token(user['id'])
     
@@ -246,6 +379,7 @@ def register():
     }), 201
 
 @app.route('/api/users/login', methods=['POST'])
+@rate_limited('auth')
 def login():
     data = request.json
     
@@ -280,6 +414,12 @@ def get_department_users(user, department):
     users = db.get_users_by_department(department)
     return jsonify({"users": users}), 200
 
+@app.route('/api/users/department/<department>/load', methods=['GET'])
+@token_required
+def get_department_load(user, department):
+    """Open-work load of a department's staff, least loaded first"""
+    return jsonify({"loads": assignment.department_loads(department)}), 200
+
 # Grievance routes
 @app.route('/api/grievances', methods=['POST'])
 @token_required
@@ -300,6 +440,11 @@ def create_grievance(user):
         grievance_text = f"Title: {data['title']}\nDescription: {data['description']}\nCategory: {data['category']}"
         ai_summary, ai_recommendation = get_ai_insights(grievance_text)
     
+    # Route to the least-loaded staff member of the submitter's department
+    assigned_to = None
+    if assignment.AUTO_ASSIGN:
+        assigned_to = assignment.assign(user.get('department'), data['priority'])
+    
     # Create grievance
     grievance, error = db.create_grievance(
         data['title'],
@@ -308,28 +453,57 @@ def create_grievance(user):
         data['priority'],
         user['id'],
         ai_summary,
-        ai_recommendation
+        ai_recommendation,
+        assigned_to,
+        user.get('department')
     )
     
     if error:
+        if assigned_to:
+            assignment.release(assigned_to, data['priority'])
         return jsonify({"error": error}), 400
     
+    sla.notify(grievance['due_at'])
+    
     return jsonify({"message": "Grievance created successfully", "grievance": grievance}), 200
 
 @app.route('/api/grievances', methods=['GET'])
 @token_required
+@rate_limited('read', per_user=True)
 def get_grievances(user):
     # Get pagination parameters
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
     
     # Get grievances based on user role
-    grievances = db.get_user_grievances(user['id'], user['role'], limit, offset)
+    try:
+        grievances = db.iter_user_grievances(user['id'], user['role'], limit, offset,
+                                             include_archived, requested_fields(), user.get('department'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return json_list_response("grievances", grievances)
+
+@app.route('/api/grievances/overdue', methods=['GET'])
+@token_required
+@rate_limited('read', per_user=True)
+def get_overdue_grievances(user):
+    """Open grievances past their SLA deadline that the user can see, most overdue first"""
+    limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
+    
+    try:
+        grievances = db.iter_overdue_grievances(user['id'], user['role'], user.get('department'),
+                                                limit, offset, requested_fields())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return jsonify({"grievances": grievances}), 200
+    return json_list_response("grievances", grievances)
 
 @app.route('/api/grievances/filter', methods=['GET'])
 @token_required
+@rate_limited('read', per_user=True)
 def filter_grievances(user):
     # Get filter parameters
     filters = {}
@@ -340,13 +514,24 @@ def filter_grievances(user):
     # Get pagination parameters
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
     
-    grievances = db.get_grievances(filters, limit, offset)
+    try:
+        # Optional created_at time range: ?from=&to= (epoch ms or ISO 8601, `to` exclusive)
+        for param in ['from', 'to']:
+            value = parse_time_param(param)
+            if value is not None:
+                filters[param] = value
+        
+        grievances = db.iter_grievances(filters, limit, offset, include_archived, requested_fields())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return jsonify({"grievances": grievances}), 200
+    return json_list_response("grievances", grievances)
 
 @app.route('/api/grievances/<grievance_id>', methods=['GET'])
 @token_required
+@rate_limited('read', per_user=True)
 def get_grievance(user, grievance_id):
     grievance = db.get_grievance(grievance_id)
     
@@ -354,7 +539,7 @@ def get_grievance(user, grievance_id):
         return jsonify({"error": "Grievance not found"}), 404
     
     # Get comments and attachments
-    comments = db.get_grievance_comments(grievance_id)
+    comments = db.get_grievance_comments(grievance_id, archived=grievance['archived'])
     attachments = db.get_grievance_attachments(grievance_id)
     
     # Add submitter and assignee details
@@ -372,15 +557,43 @@ def get_grievance(user, grievance_id):
     return jsonify({
         "grievance": grievance,
         "comments": comments,
+        "comments_cursor": db.encode_comment_cursor(comments[-1]) if comments else None,
         "attachments": attachments
     }), 200
 
 
 
+@app.route('/api/grievances/duplicates', methods=['POST'])
+@token_required
+@rate_limited('read', per_user=True)
+def find_duplicates(user):
+    """Find existing grievances similar to a draft title/description"""
+    data = request.json
+    if not data or not (data.get('title') or data.get('description')):
+        return jsonify({"error": "title or description is required"}), 400
+    
+    duplicates = db.find_duplicate_grievances(data.get('title', ''), data.get('description', ''),
+                                              user['id'], user['role'], user.get('department'))
+    return jsonify({"duplicates": duplicates}), 200
+
+@app.route('/api/grievances/<grievance_id>/duplicates', methods=['GET'])
+@token_required
+@rate_limited('read', per_user=True)
+def get_grievance_duplicates(user, grievance_id):
+    grievance = db.get_grievance(grievance_id)
+    if not grievance:
+        return jsonify({"error": "Grievance not found"}), 404
+    
+    duplicates = db.find_duplicate_grievances(grievance['title'], grievance['description'],
+                                              user['id'], user['role'], user.get('department'),
+                                              exclude_id=grievance_id)
+    return jsonify({"duplicates": duplicates}), 200
+
 @app.route('/api/grievances/<grievance_id>', methods=['PUT'])
 @token_required
 def update_grievance(user, grievance_id):
-    grievance = db.get_grievance(grievance_id)
+    # Archived grievances are read-only
+    grievance = db.get_grievance(grievance_id, include_archived=False)
     
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
@@ -396,13 +609,16 @@ def update_grievance(user, grievance_id):
     if error:
         return jsonify({"error": error}), 400
     
+    assignment.grievance_changed(grievance, updated_grievance)
+    sla.notify(updated_grievance['due_at'])
+    
     return jsonify({"message": "Grievance updated successfully", "grievance": updated_grievance}), 200
 
 # Comment routes
 @app.route('/api/grievances/<grievance_id>/comments', methods=['POST'])
 @token_required
 def add_comment(user, grievance_id):
-    grievance = db.get_grievance(grievance_id)
+    grievance = db.get_grievance(grievance_id, include_archived=False)
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
@@ -419,14 +635,94 @@ def add_comment(user, grievance_id):
 
 @app.route('/api/grievances/<grievance_id>/comments', methods=['GET'])
 @token_required
+@rate_limited('read', per_user=True)
 def get_comments(user, grievance_id):
     grievance = db.get_grievance(grievance_id)
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
-    comments = db.get_grievance_comments(grievance_id)
+    # Incremental fetching: ?since=<cursor> returns only newer comments, ?limit= pages long threads.
+    # Without either the whole thread is returned, as callers that predate paging expect.
+    since = request.args.get('since')
+    if since is None and 'limit' not in request.args:
+        comments = db.get_grievance_comments(grievance_id, archived=grievance['archived'])
+        next_cursor = db.encode_comment_cursor(comments[-1]) if comments else None
+        return jsonify({"comments": comments, "next_cursor": next_cursor, "has_more": False}), 200
+    
+    limit = max(1, min(int(request.args.get('limit', COMMENT_PAGE_SIZE)), MAX_COMMENT_PAGE_SIZE))
+    
+    try:
+        # Fetch one extra row to know whether another page follows
+        comments = db.get_grievance_comments(grievance_id, since, limit + 1, grievance['archived'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+    
+    # With no new comments the cursor stays where the client already is
+    next_cursor = db.encode_comment_cursor(comments[-1]) if comments else since
     
-    return jsonify({"comments": comments}), 200
+    return jsonify({"comments": comments, "next_cursor": next_cursor, "has_more": has_more}), 200
+
+# Live change feed
+@app.route('/api/events', methods=['GET'])
+@token_required(allow_query_token=True)
+def stream_events(user):
+    """Server-Sent Events stream of grievance, comment and attachment changes visible to the user"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    try:
+        last_id = int(last_event_id) if last_event_id else db.get_latest_change_id()
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+    
+    # Streams share one per-process poller; each still holds a server thread, so they are capped per worker
+    subscription = events.subscribe()
+    if subscription is None:
+        response = jsonify({"error": "Too many open event streams, try again later"})
+        response.headers['Retry-After'] = str(EVENT_RETRY_MS // 1000)
+        return response, 503
+    
+    user_id = user['id']
+    role = user.get('role', '')
+    department = user.get('department')
+    
+    def event(change):
+        payload = json.dumps(format_timestamps(json.loads(change['payload'])))
+        return format_sse(payload, change['event'], change['id'])
+    
+    def generate():
+        nonlocal last_id
+        yield f"retry: {EVENT_RETRY_MS}\n\n"
+        
+        # Catch up on events missed since Last-Event-ID; the shared feed is already buffering newer ones
+        while True:
+            changes = db.get_changes(user_id, role, department, last_id)
+            for change in changes:
+                last_id = change['id']
+                yield event(change)
+            if len(changes) < 100:
+                break
+        
+        started = time.monotonic()
+        while time.monotonic() - started < EVENT_STREAM_MAX_SECONDS and not subscription.overflowed:
+            try:
+                change = subscription.queue.get(timeout=EVENT_HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if change['id'] > last_id and db.change_visible(change, user_id, role, department):
+                last_id = change['id']
+                yield event(change)
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(lambda: events.unsubscribe(subscription))
+    return response
 
 @app.route('/images/<path:filename>', methods=['GET'])
 def get_image(filename):
@@ -457,7 +753,7 @@ def get_image(filename):
 @app.route('/api/grievances/<grievance_id>/attachments', methods=['POST'])
 @token_required
 def upload_attachment(user, grievance_id):
-    grievance = db.get_grievance(grievance_id)
+    grievance = db.get_grievance(grievance_id, include_archived=False)
     if not grievance:
         return jsonify({"error": "Grievance not found"}), 404
     
@@ -509,7 +805,14 @@ def download_file(user, filename):
 
 @app.route('/api/statistics', methods=['GET'])
 @token_required
+@rate_limited('read', per_user=True)
 def get_statistics(user):
+    try:
+        time_from = parse_time_param('from')
+        time_to = parse_time_param('to')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     conn = db.get_db_connection()
     
     try:
@@ -525,6 +828,14 @@ def get_statistics(user):
             base_query = 'submitted_by = ?'
             params = (user_id,)
         
+        # Optional created_at time range (index-backed)
+        if time_from is not None:
+            base_query += ' AND created_at >= ?'
+            params += (time_from,)
+        if time_to is not None:
+            base_query += ' AND created_at < ?'
+            params += (time_to,)
+        
         # Total grievances
         total_query = conn.execute(f'''
             SELECT COUNT(*) as count 
@@ -581,6 +892,49 @@ def get_statistics(user):
     finally:
         conn.close()
 
+@app.route('/api/statistics/trends', methods=['GET'])
+@token_required
+@rate_limited('read', per_user=True)
+def get_statistics_trends(user):
+    """
+    New vs. closed grievances over time, read only from the daily rollups.
+    ?from=&to= (epoch ms or ISO 8601, `to` exclusive), ?group_by=category|priority|department,
+    ?interval=day|week|month. Staff only see their own department.
+    """
+    user_role = user.get('role', '').lower()
+    if user_role not in ['admin', 'manager', 'staff']:
+        return jsonify({"error": "Unauthorized to view trends"}), 403
+    department = user.get('department') if user_role == 'staff' else None
+    
+    try:
+        time_to = parse_time_param('to')
+        time_from = parse_time_param('from')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if time_to is None:
+        time_to = db.now_ms()
+    if time_from is None:
+        time_from = time_to - TRENDS_DEFAULT_DAYS * db.MS_PER_DAY
+    
+    # Whole UTC days, including a partial last day
+    start_day = db.rollup_day(time_from)
+    end_day = db.rollup_day(time_to - 1) + 1
+    if end_day <= start_day:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    if end_day - start_day > TRENDS_MAX_DAYS:
+        return jsonify({"error": f"Trends span at most {TRENDS_MAX_DAYS} days"}), 400
+    
+    group_by = request.args.get('group_by')
+    try:
+        rows = db.get_daily_rollups(start_day, end_day, group_by, department)
+        import trends
+        result = trends.build_series(rows, start_day, end_day, request.args.get('interval', 'day'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    result["group_by"] = group_by
+    return jsonify(result), 200
+
 @app.route('/api/users/<user_id>', methods=['PUT'])
 @token_required
 def update_profile(current_user, user_id):
@@ -590,12 +944,16 @@ def update_profile(current_user, user_id):
     # Update the user's profile
     updated_user = db.update_profile(user_id, data)
     
+    if updated_user and "department" in data:
+        assignment.rebuild()
+    
     if updated_user:
         return jsonify({"message": "User profile updated successfully", "user": updated_user}), 200
     else:
         return jsonify({"error": "User not found"}), 404
     
 @app.route("/forgot/<id>", methods=["POST"])
+@rate_limited('auth')
 def forgot_password(id):
     data = request.get_json()
     print(data)
@@ -616,5 +974,7 @@ def get_email(email):
     data = db.get_user_by_email(email)
     return data
 
+# Development server only; use `python server.py` in production
 if __name__ == '__main__':
+    create_app()
     app.run(host="0.0.0.0",port=5000,debug=True)
\ No newline at end of file
@@ -0,0 +1,18 @@
+import sys
+import db
+
+def run_archival(older_than_days=None, batch_size=None):
+    """Move long-closed grievances into the archive tables and prune old change events"""
+    db.init_db()
+    archived = db.archive_closed_grievances(older_than_days, batch_size)
+    print(f"Archived {archived} closed grievance(s)")
+    
+    pruned = db.prune_change_log(db.CHANGE_LOG_RETENTION_DAYS)
+    print(f"Pruned {pruned} change event(s)")
+    return archived
+
+# Usage: python archive.py [older_than_days] [batch_size]
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    run_archival(days, batch)
@@ -0,0 +1,118 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+import db
+
+# Load-aware automatic assignment. For each department a min-heap of
+# (open load, staff id) picks the least-loaded staff member in O(log n).
+# Stale heap entries are skipped lazily instead of being removed in place.
+# The heaps are per process: with several workers, assignments and escalations made by
+# the others only show up when loads are reloaded, so they are refreshed from the
+# database once they are older than ASSIGNMENT_REFRESH_SECONDS.
+AUTO_ASSIGN = os.getenv('AUTO_ASSIGN', '1') == '1'
+ASSIGNMENT_REFRESH_SECONDS = float(os.getenv('ASSIGNMENT_REFRESH_SECONDS', 30))
+PRIORITY_WEIGHTED = os.getenv('ASSIGNMENT_PRIORITY_WEIGHTED', '0') == '1'
+PRIORITY_WEIGHTS = {'urgent': 4, 'high': 3, 'medium': 2, 'low': 1}
+
+_lock = threading.Lock()
+_heaps = {}             # department -> [(load, seq, staff_id)]
+_loads = {}             # staff_id -> current load
+_departments = {}       # staff_id -> department
+_members = {}           # department -> [staff_id]
+_counter = itertools.count()
+_loaded_at = None       # time.monotonic() of the last rebuild
+
+def priority_weight(priority):
+    """Weight a grievance contributes to its assignee's load"""
+    if not PRIORITY_WEIGHTED or not priority:
+        return 1
+    return PRIORITY_WEIGHTS.get(db.priority_level(priority), 1)
+
+def _is_open(grievance):
+    return grievance.get('status') not in db.CLOSED_STATUSES
+
+def _push(staff_id):
+    heapq.heappush(_heaps.setdefault(_departments[staff_id], []), (_loads[staff_id], next(_counter), staff_id))
+
+def _compact(department):
+    """Rebuild a department heap once stale entries dominate it"""
+    heap = _heaps.get(department, [])
+    members = _members.get(department, [])
+    if len(heap) > 4 * max(len(members), 1):
+        _heaps[department] = [(_loads[staff_id], next(_counter), staff_id) for staff_id in members]
+        heapq.heapify(_heaps[department])
+
+def rebuild():
+    """Reload staff and their open-grievance loads from the database"""
+    with _lock:
+        _rebuild()
+
+def _rebuild():
+    # Called with _lock held, so no adjustment can land between the read and the swap and be lost
+    global _loaded_at
+    rows = db.get_staff_open_loads()
+    _loaded_at = time.monotonic()
+    _heaps.clear()
+    _loads.clear()
+    _departments.clear()
+    _members.clear()
+    for row in rows:
+        if row['id'] not in _departments:
+            _departments[row['id']] = row['department']
+            _members.setdefault(row['department'], []).append(row['id'])
+        _loads[row['id']] = _loads.get(row['id'], 0) + row['open_count'] * priority_weight(row['priority'])
+    for staff_id in _loads:
+        _push(staff_id)
+
+def _is_stale():
+    return _loaded_at is None or time.monotonic() - _loaded_at >= ASSIGNMENT_REFRESH_SECONDS
+
+def _refresh_if_stale():
+    """Pick up loads changed by other worker processes"""
+    if _is_stale():
+        with _lock:
+            if _is_stale():  # not already reloaded by another thread
+                _rebuild()
+
+def _adjust(staff_id, delta):
+    if staff_id not in _departments:
+        # Assigned to someone who is not staff (e.g. a manager); not tracked
+        return
+    _loads[staff_id] += delta
+    _push(staff_id)
+    _compact(_departments[staff_id])
+
+def assign(department, priority=None):
+    """Pick the least-loaded staff member in a department and count the new grievance against them"""
+    _refresh_if_stale()
+    with _lock:
+        heap = _heaps.get(department)
+        while heap:
+            load, _, staff_id = heap[0]
+            if _departments.get(staff_id) == department and _loads.get(staff_id) == load:
+                _adjust(staff_id, priority_weight(priority))
+                return staff_id
+            heapq.heappop(heap)  # stale entry
+    return None
+
+def release(staff_id, priority=None):
+    """Undo an assign() whose grievance was not created"""
+    with _lock:
+        _adjust(staff_id, -priority_weight(priority))
+
+def grievance_changed(old, new):
+    """Update loads after a grievance's status, assignee or priority changed"""
+    with _lock:
+        if old.get('assigned_to') and _is_open(old):
+            _adjust(old['assigned_to'], -priority_weight(old.get('priority')))
+        if new.get('assigned_to') and _is_open(new):
+            _adjust(new['assigned_to'], priority_weight(new.get('priority')))
+
+def department_loads(department):
+    """Current loads of a department's staff, least loaded first"""
+    _refresh_if_stale()
+    with _lock:
+        loads = [{'id': staff_id, 'load': _loads[staff_id]} for staff_id in _members.get(department, [])]
+    return sorted(loads, key=lambda item: item['load'])
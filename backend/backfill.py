@@ -0,0 +1,31 @@
+import sys
+import db
+
+def backfill_signatures():
+    """Index MinHash signatures for grievances created before duplicate detection existed"""
+    indexed = db.backfill_grievance_signatures()
+    print(f"Indexed {indexed} grievance signature(s)")
+
+def compact_database():
+    """Rebuild tables and indexes to defragment pages left behind by random uuid4 keys"""
+    db.compact_database()
+    print(f"Compacted {db.DATABASE_NAME}")
+
+def rebuild_rollups():
+    """Recompute the daily trend rollups from existing (live and archived) grievances"""
+    buckets = db.rebuild_daily_rollups()
+    print(f"Rebuilt {buckets} daily rollup bucket(s)")
+
+COMMANDS = {
+    'signatures': backfill_signatures,
+    'compact': compact_database,
+    'rollups': rebuild_rollups,
+}
+
+# Usage: python backfill.py <command>
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python backfill.py [{'|'.join(COMMANDS)}]")
+        sys.exit(1)
+    db.init_db()
+    COMMANDS[sys.argv[1]]()
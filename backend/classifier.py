@@ -0,0 +1,275 @@
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+import numpy as np
+
+# Local fast-path classifier for grievance category and priority.
+# Features are hashed TF-IDF unigrams and bigrams; each label set gets its own
+# softmax (multinomial logistic regression) head trained with mini-batch gradient descent.
+# Softmax scores are not calibrated probabilities, so each head's confidence threshold is
+# chosen on a held-out split to reach TARGET_PRECISION and saved with the model; a model
+# whose confident predictions miss the target on the holdout never answers on its own.
+MODEL_PATH = os.getenv('CLASSIFIER_MODEL_PATH', 'classifier_model.npz')
+TARGET_PRECISION = float(os.getenv('CLASSIFIER_TARGET_PRECISION', 0.95))
+# Floor for calibrated thresholds
+CONFIDENCE_THRESHOLD = float(os.getenv('CLASSIFIER_CONFIDENCE', 0.85))
+# Fewest holdout predictions a threshold must cover for its precision to count
+MIN_CALIBRATION_ROWS = 20
+N_FEATURES = 2 ** 14
+MIN_TRAINING_ROWS = 50
+EPOCHS = 30
+BATCH_SIZE = 256
+LEARNING_RATE = 5.0
+L2_PENALTY = 1e-4
+
+_WORD_RE = re.compile(r'\w+')
+
+_lock = threading.Lock()
+_model = None
+_model_mtime = None
+
+def features(title, description):
+    """Hashed term counts as (indices, log-scaled counts)"""
+    words = _WORD_RE.findall(f"{title or ''} {description or ''}".lower())
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not terms:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    
+    hashed = np.fromiter((zlib.crc32(term.encode('utf-8')) % N_FEATURES for term in terms),
+                         dtype=np.int64, count=len(terms))
+    indices, counts = np.unique(hashed, return_counts=True)
+    return indices, np.log1p(counts).astype(np.float32)
+
+def _tfidf(indices, values, idf):
+    """Apply IDF weights and L2-normalize a sparse feature vector"""
+    weighted = values * idf[indices]
+    norm = np.linalg.norm(weighted)
+    return weighted / norm if norm else weighted
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def _train_head(docs, targets, n_classes, rng):
+    """Fit one softmax head on sparse TF-IDF docs"""
+    weights = np.zeros((N_FEATURES, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    order = np.arange(len(docs))
+    
+    for _ in range(EPOCHS):
+        rng.shuffle(order)
+        for start in range(0, len(order), BATCH_SIZE):
+            batch = order[start:start + BATCH_SIZE]
+            # Densify only the current mini-batch
+            dense = np.zeros((len(batch), N_FEATURES), dtype=np.float32)
+            for row, doc in enumerate(batch):
+                indices, values = docs[doc]
+                dense[row, indices] = values
+            
+            probs = _softmax(dense @ weights + bias)
+            probs[np.arange(len(batch)), targets[batch]] -= 1.0
+            probs /= len(batch)
+            
+            weights -= LEARNING_RATE * (dense.T @ probs + L2_PENALTY * weights)
+            bias -= LEARNING_RATE * probs.sum(axis=0)
+    
+    return weights, bias
+
+def train(rows, seed=0):
+    """
+    Train a model from dicts with title, description, category and priority.
+    Returns the model as a dict of arrays (the format saved to MODEL_PATH).
+    """
+    rows = [row for row in rows if row.get('category') and row.get('priority')]
+    if len(rows) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Need at least {MIN_TRAINING_ROWS} labelled grievances to train, found {len(rows)}")
+    
+    raw = [features(row['title'], row['description']) for row in rows]
+    
+    document_frequency = np.zeros(N_FEATURES, dtype=np.float32)
+    for indices, _ in raw:
+        document_frequency[indices] += 1
+    idf = (np.log((1 + len(raw)) / (1 + document_frequency)) + 1).astype(np.float32)
+    docs = [(indices, _tfidf(indices, values, idf)) for indices, values in raw]
+    
+    rng = np.random.default_rng(seed)
+    model = {'idf': idf}
+    for head in ('category', 'priority'):
+        labels = sorted({row[head] for row in rows})
+        targets = np.array([labels.index(row[head]) for row in rows])
+        weights, bias = _train_head(docs, targets, len(labels), rng)
+        model[f'{head}_labels'] = np.array(labels)
+        model[f'{head}_weights'] = weights
+        model[f'{head}_bias'] = bias
+    
+    return model
+
+def predict(model, title, description):
+    """Predict category and priority with confidences, e.g. {'category': (label, 0.93), ...}"""
+    indices, values = features(title, description)
+    values = _tfidf(indices, values, model['idf'])
+    
+    prediction = {}
+    for head in ('category', 'priority'):
+        probs = _softmax(values @ model[f'{head}_weights'][indices] + model[f'{head}_bias'])
+        best = int(probs.argmax())
+        prediction[head] = (str(model[f'{head}_labels'][best]), float(probs[best]))
+    return prediction
+
+def save_model(model, path=MODEL_PATH):
+    with open(path, 'wb') as f:
+        np.savez(f, **model)
+
+def load_model(path=MODEL_PATH):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+def get_model():
+    """Return the trained model, reloading it when the model file changes; None if not trained yet"""
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+    
+    if _model is None or mtime != _model_mtime:
+        with _lock:
+            if _model is None or mtime != _model_mtime:
+                _model = load_model()
+                _model_mtime = mtime
+    return _model
+
+def thresholds(model, threshold=None):
+    """Per-head confidence thresholds: the calibrated ones saved with the model unless overridden"""
+    if threshold is not None:
+        return {'category': threshold, 'priority': threshold}
+    # Models saved without calibration never take the fast path
+    return {head: float(model.get(f'{head}_threshold', np.inf)) for head in ('category', 'priority')}
+
+def fast_path_enabled(model):
+    return model is not None and all(np.isfinite(value) for value in thresholds(model).values())
+
+def classify(title, description, threshold=None):
+    """
+    Fast-path classification. Returns {'category', 'priority', 'confidence'} when both
+    predictions clear their thresholds, otherwise None (caller falls back to the LLM).
+    """
+    model = get_model()
+    if model is None:
+        return None
+    limits = thresholds(model, threshold)
+    
+    prediction = predict(model, title, description)
+    (category, category_confidence), (priority, priority_confidence) = prediction['category'], prediction['priority']
+    if category_confidence < limits['category'] or priority_confidence < limits['priority']:
+        return None
+    
+    return {
+        'category': category,
+        'priority': priority,
+        'confidence': {'category': round(category_confidence, 3), 'priority': round(priority_confidence, 3)}
+    }
+
+def _calibrate_head(confidences, hits, target):
+    """
+    Lowest confidence at which the predictions at or above it reach `target` precision
+    (covering at least MIN_CALIBRATION_ROWS of them), or inf when no threshold does.
+    """
+    order = np.argsort(-confidences)
+    covered = np.arange(1, len(order) + 1)
+    precision = np.cumsum(hits[order]) / covered
+    passing = np.flatnonzero((precision >= target) & (covered >= MIN_CALIBRATION_ROWS))
+    if not len(passing):
+        return np.inf
+    return max(float(confidences[order][passing[-1]]), CONFIDENCE_THRESHOLD)
+
+def calibrate(model, rows, target=None):
+    """
+    Choose and store per-head thresholds on held-out rows, then disable the fast path
+    (infinite thresholds) unless confident predictions of both heads together reach `target`.
+    Returns the holdout report for the calibrated model.
+    """
+    target = TARGET_PRECISION if target is None else target
+    predictions = [predict(model, row['title'], row['description']) for row in rows]
+    for head in ('category', 'priority'):
+        confidences = np.array([prediction[head][1] for prediction in predictions])
+        hits = np.array([prediction[head][0] == row[head] for prediction, row in zip(predictions, rows)])
+        model[f'{head}_threshold'] = np.float32(_calibrate_head(confidences, hits, target))
+    
+    evaluation = report(model, rows)
+    if evaluation['fast_path_accuracy'] is None or evaluation['fast_path_accuracy'] < target:
+        for head in ('category', 'priority'):
+            model[f'{head}_threshold'] = np.float32(np.inf)
+    evaluation['fast_path_enabled'] = fast_path_enabled(model)
+    return evaluation
+
+def report(model, rows, threshold=None):
+    """Accuracy, confident-coverage and latency of a model on labelled rows"""
+    limits = thresholds(model, threshold)
+    correct = {'category': 0, 'priority': 0}
+    confident = confident_correct = 0
+    
+    started = time.perf_counter()
+    for row in rows:
+        prediction = predict(model, row['title'], row['description'])
+        hits = {head: prediction[head][0] == row[head] for head in correct}
+        for head, hit in hits.items():
+            correct[head] += hit
+        if all(prediction[head][1] >= limits[head] for head in limits):
+            confident += 1
+            confident_correct += all(hits.values())
+    elapsed = time.perf_counter() - started
+    
+    total = max(len(rows), 1)
+    return {
+        'rows': len(rows),
+        'category_accuracy': correct['category'] / total,
+        'priority_accuracy': correct['priority'] / total,
+        'fast_path_coverage': confident / total,
+        'fast_path_accuracy': confident_correct / confident if confident else None,
+        'avg_latency_ms': elapsed * 1000 / total
+    }
+
+def retrain(holdout=0.2, seed=0):
+    """
+    Train on historical grievances, calibrate the fast-path thresholds on a held-out split and
+    save the calibrated model. Without enough rows for a holdout the fast path stays disabled.
+    """
+    import db
+    rows = list(db.iter_training_rows())
+    rng = np.random.default_rng(seed)
+    rng.shuffle(rows)
+    
+    split = int(len(rows) * (1 - holdout))
+    if split >= MIN_TRAINING_ROWS and split < len(rows):
+        started = time.perf_counter()
+        # The saved model is the one the thresholds were measured on
+        model = train(rows[:split], seed)
+        trained_on = split
+        evaluation = calibrate(model, rows[split:])
+        evaluation['train_seconds'] = time.perf_counter() - started
+        for head in ('category', 'priority'):
+            evaluation[f'{head}_threshold'] = float(model[f'{head}_threshold'])
+        for key, value in evaluation.items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    else:
+        model = train(rows, seed)
+        trained_on = len(rows)
+        for head in ('category', 'priority'):
+            model[f'{head}_threshold'] = np.float32(np.inf)
+        print("Not enough grievances for a holdout split; fast path disabled")
+    
+    save_model(model)
+    state = 'enabled' if fast_path_enabled(model) else 'disabled'
+    print(f"Saved classifier trained on {trained_on} grievance(s) to {MODEL_PATH}; fast path {state}")
+
+# Usage: python classifier.py train
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'train':
+        print("Usage: python classifier.py train")
+        sys.exit(1)
+    retrain()
@@ -1,21 +1,179 @@
+import base64
+import json
+import os
 import sqlite3
-import uuid
+import ids
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from group_commit import GroupCommitWriter
+import dedup
 
 # Database configuration
 DATABASE_NAME = 'grievance_system.db'
+# Seconds a connection waits on another process's write lock before failing
+DATABASE_TIMEOUT = float(os.getenv('DATABASE_TIMEOUT', 5))
+
+# Archival configuration: closed grievances older than this are moved out of the hot tables
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+
+# Change events older than this are pruned by the archival job
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 7))
+
+# Group commit: coalesce concurrent inserts arriving within a few milliseconds into one transaction
+GROUP_COMMIT_ENABLED = os.getenv('GROUP_COMMIT', '0') == '1'
+GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', 5))
+
+# Near-duplicate detection (estimated Jaccard similarity of MinHash signatures)
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', 0.5))
+ANALYSIS_REUSE_THRESHOLD = float(os.getenv('ANALYSIS_REUSE_THRESHOLD', 0.8))
+
+# Number of rows fetched from the cursor at a time when streaming list results
+STREAM_BATCH_SIZE = 500
+
+# Columns shared by the live and archive tables (archive tables mirror the live schema)
+GRIEVANCE_COLUMNS = ['id', 'title', 'description', 'category', 'priority', 'status', 'submitted_by',
+                     'assigned_to', 'ai_summary', 'ai_recommendation', 'created_at', 'updated_at',
+                     'submitter_department', 'due_at', 'escalation_level']
+COMMENT_COLUMNS = ['id', 'grievance_id', 'user_id', 'content', 'created_at']
+ATTACHMENT_COLUMNS = ['id', 'grievance_id', 'file_name', 'file_path', 'uploaded_by', 'created_at']
+
+# Bumped whenever _migrate gains a step
+SCHEMA_VERSION = 5
+
+# Timestamp columns per table (integer epoch milliseconds)
+TIMESTAMP_COLUMNS = {
+    'users': ['created_at'],
+    'grievances': ['created_at', 'updated_at'],
+    'grievances_archive': ['created_at', 'updated_at'],
+    'comments': ['created_at'],
+    'comments_archive': ['created_at'],
+    'attachments': ['created_at'],
+    'attachments_archive': ['created_at'],
+    'change_log': ['created_at'],
+    'ai_analyses': ['created_at'],
+    'ai_usage': ['created_at'],
+}
+
+# Statuses that no longer count as open work (SLA, assignment load, rollups, archival). Staff
+# visibility is a separate access rule: department staff lose sight of a grievance only once it is 'Closed'.
+CLOSED_STATUSES = ('Closed', 'Resolved')
+# The same statuses as an SQL list literal, for `status IN (...)` predicates
+CLOSED_STATUSES_SQL = ', '.join(f"'{status}'" for status in CLOSED_STATUSES)
+
+# Compact column set returned by list endpoints unless other fields are requested
+GRIEVANCE_LIST_COLUMNS = ['id', 'title', 'category', 'priority', 'status', 'submitted_by',
+                          'assigned_to', 'created_at', 'updated_at', 'due_at']
+
+# Trend rollups: dimensions a trend series can be grouped by (columns of daily_rollups)
+ROLLUP_DIMENSIONS = ('category', 'priority', 'department')
+MS_PER_DAY = 86400000
+
+# Priority levels as the client stores them, lowest first. AI analyses label the top level
+# 'Critical - ...', and labels may carry a description ('High - Needs ...'); see priority_level.
+PRIORITY_LEVELS = ('low', 'medium', 'high', 'urgent')
+PRIORITY_ALIASES = {'critical': 'urgent'}
+
+# SLA: hours an open grievance of each priority may wait before it is escalated
+SLA_HOURS = {level: float(os.getenv(f'SLA_HOURS_{level.upper()}', hours))
+             for level, hours in {'urgent': 24, 'high': 72, 'medium': 168, 'low': 720}.items()}
+if any(hours <= 0 for hours in SLA_HOURS.values()):
+    # A deadline that is already due on escalation would be escalated again and again
+    raise ValueError("SLA_HOURS_* must be positive")
+
+# Timestamps are stored as integer epoch milliseconds (UTC) and formatted as ISO 8601 only in API responses
+def now_ms():
+    """Current time in epoch milliseconds"""
+    return time.time_ns() // 1_000_000
+
+def priority_level(priority):
+    """Level of a stored priority in PRIORITY_LEVELS terms ('High - Needs ...' -> 'high', 'Critical' -> 'urgent')"""
+    level = (priority or '').split(' ')[0].lower()
+    return PRIORITY_ALIASES.get(level, level)
+
+def sla_due_at(priority, start_ms, status=None):
+    """SLA deadline (epoch ms) of a grievance counted from `start_ms`, or None once it is closed"""
+    if status in CLOSED_STATUSES or start_ms is None:
+        return None
+    return int(start_ms + SLA_HOURS.get(priority_level(priority), SLA_HOURS['medium']) * 3600000)
+
+def days_ago_ms(days):
+    """Epoch milliseconds `days` days before now"""
+    return now_ms() - int(days * MS_PER_DAY)
+
+def to_epoch_ms(value):
+    """
+    Convert a legacy timestamp to epoch milliseconds. Naive ISO strings with a 'T' were written
+    with datetime.now() (local time); 'YYYY-MM-DD HH:MM:SS' strings came from CURRENT_TIMESTAMP (UTC).
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone() if 'T' in value else parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
 
 def get_db_connection():
     """Create and return a database connection with row factory"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_TIMEOUT)
     conn.row_factory = sqlite3.Row
     return conn
 
+def init_worker():
+    """
+    Prepare database access in a freshly started (or forked) worker process:
+    verify this process can open its own connection and start its group-commit
+    writer, whose connection must not be shared with the parent.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('SELECT 1').fetchone()
+    finally:
+        conn.close()
+    if GROUP_COMMIT_ENABLED:
+        _group_writer.start()
+
+def check_writable():
+    """Return True if the database can take the write lock (used by the readiness probe)"""
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.rollback()
+        return True
+    finally:
+        conn.close()
+
+_group_writer = GroupCommitWriter(lambda: get_db_connection(), GROUP_COMMIT_WINDOW_MS)
+
+def _run_write(write):
+    """
+    Run `write(conn)` in a committed transaction and return its result.
+    With GROUP_COMMIT enabled the write is batched with concurrent ones and this
+    returns once the shared transaction has committed.
+    """
+    if GROUP_COMMIT_ENABLED:
+        return _group_writer.submit(write).result()
+    
+    conn = get_db_connection()
+    try:
+        result = write(conn)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 def init_db():
     """Initialize the database with required tables"""
     conn = get_db_connection()
     
+    # WAL lets worker processes keep reading while one of them writes; the mode is
+    # stored in the database file, so setting it once here covers every connection
+    conn.execute('PRAGMA journal_mode=WAL')
+    
     # Users table
     conn.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -25,7 +183,7 @@ def init_db():
         password TEXT NOT NULL,
         role TEXT NOT NULL,
         department TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
     )
     ''')
     
@@ -42,8 +200,11 @@ def init_db():
         assigned_to TEXT,
         ai_summary TEXT,
         ai_recommendation TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
+        updated_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
+        submitter_department TEXT,
+        due_at INTEGER,
+        escalation_level INTEGER DEFAULT 0,
         FOREIGN KEY (submitted_by) REFERENCES users (id),
         FOREIGN KEY (assigned_to) REFERENCES users (id)
     )
@@ -56,7 +217,7 @@ def init_db():
         grievance_id TEXT NOT NULL,
         user_id TEXT NOT NULL,
         content TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
         FOREIGN KEY (grievance_id) REFERENCES grievances (id),
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
@@ -70,16 +231,209 @@ def init_db():
         file_name TEXT NOT NULL,
         file_path TEXT NOT NULL,
         uploaded_by TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
         FOREIGN KEY (grievance_id) REFERENCES grievances (id),
         FOREIGN KEY (uploaded_by) REFERENCES users (id)
     )
     ''')
     
+    # Archive tables for closed grievances (same columns as the live tables)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS grievances_archive (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        category TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        status TEXT NOT NULL,
+        submitted_by TEXT NOT NULL,
+        assigned_to TEXT,
+        ai_summary TEXT,
+        ai_recommendation TEXT,
+        created_at INTEGER,
+        updated_at INTEGER,
+        submitter_department TEXT,
+        due_at INTEGER,
+        escalation_level INTEGER DEFAULT 0
+    )
+    ''')
+    
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS comments_archive (
+        id TEXT PRIMARY KEY,
+        grievance_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at INTEGER
+    )
+    ''')
+    
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS attachments_archive (
+        id TEXT PRIMARY KEY,
+        grievance_id TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        uploaded_by TEXT NOT NULL,
+        created_at INTEGER
+    )
+    ''')
+    
+    # Append-only change log feeding the live event stream. Visibility columns are copied from the
+    # grievance at write time so the feed can be filtered without joins.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        grievance_id TEXT NOT NULL,
+        submitted_by TEXT,
+        assigned_to TEXT,
+        department TEXT,
+        status TEXT,
+        payload TEXT NOT NULL,
+        created_at INTEGER
+    )
+    ''')
+    
+    # MinHash signatures and LSH buckets for near-duplicate lookups.
+    # `kind` is 'grievance' or 'analysis:<mode>' (cached AI analyses, per prompt mode).
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS minhash_signatures (
+        kind TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        signature BLOB NOT NULL,
+        PRIMARY KEY (kind, item_id)
+    ) WITHOUT ROWID
+    ''')
+    
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS lsh_buckets (
+        kind TEXT NOT NULL,
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        item_id TEXT NOT NULL,
+        PRIMARY KEY (kind, band, bucket, item_id)
+    ) WITHOUT ROWID
+    ''')
+    
+    # AI analyses kept for reuse on near-identical submissions
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ai_analyses (
+        id TEXT PRIMARY KEY,
+        title TEXT,
+        description TEXT,
+        response_text TEXT NOT NULL,
+        category TEXT,
+        priority TEXT,
+        created_at INTEGER,
+        mode TEXT
+    )
+    ''')
+    
+    # Token usage and latency per AI call
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ai_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mode TEXT NOT NULL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        latency_ms REAL,
+        created_at INTEGER
+    )
+    ''')
+    
+    # Daily trend buckets (UTC day number), kept current by grievance writes; see rebuild_daily_rollups
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        day INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        department TEXT NOT NULL,
+        opened INTEGER NOT NULL DEFAULT 0,
+        closed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category, priority, department)
+    ) WITHOUT ROWID
+    ''')
+    
+    # Indexes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_status_updated ON grievances (status, updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_assigned_status ON grievances (assigned_to, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_created ON grievances (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_submitter_created ON grievances (submitted_by, created_at)')
+    
+    _migrate(conn)
+    
+    # Staff visibility: one ordered index scan per branch of the UNION in _user_grievances_query
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_assigned_created ON grievances (assigned_to, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_department_created ON grievances (submitter_department, created_at)')
+    # Closed grievances have no deadline, so this partial index holds only open work: the next
+    # deadline and the overdue set are both short range scans however large the table grows
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_grievances_due ON grievances (due_at) WHERE due_at IS NOT NULL')
+    # (grievance_id, created_at, id) serves both the thread listing and the since-cursor range scan
+    conn.execute('DROP INDEX IF EXISTS idx_comments_grievance')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_grievance_created ON comments (grievance_id, created_at, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attachments_grievance ON attachments (grievance_id)')
+    conn.execute('DROP INDEX IF EXISTS idx_comments_archive_grievance')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_archive_grievance_created ON comments_archive (grievance_id, created_at, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attachments_archive_grievance ON attachments_archive (grievance_id)')
+    
     conn.commit()
     conn.close()
     print(f"Database initialized: {DATABASE_NAME}")
 
+def _add_column_if_missing(conn, table, column, definition):
+    """Add a column to an existing table. Returns True if it was added."""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    if column in columns:
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+def _migrate(conn):
+    """Bring databases created by older versions up to the current schema (tracked in PRAGMA user_version)"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    if version < 1:
+        # Denormalized submitter department, backfilled from users
+        for table in ('grievances', 'grievances_archive'):
+            if _add_column_if_missing(conn, table, 'submitter_department', 'TEXT'):
+                conn.execute(f'''UPDATE {table} SET submitter_department = 
+                                 (SELECT department FROM users WHERE users.id = {table}.submitted_by)''')
+    
+    if version < 2:
+        # Text timestamps (mixed local ISO and UTC CURRENT_TIMESTAMP) become integer epoch milliseconds
+        conn.create_function('to_epoch_ms', 1, to_epoch_ms)
+        for table, columns in TIMESTAMP_COLUMNS.items():
+            for column in columns:
+                conn.execute(f"UPDATE {table} SET {column} = to_epoch_ms({column}) WHERE typeof({column}) = 'text'")
+    
+    if version < 3:
+        # SLA deadlines for grievances that are still open. Existing ones are counted from the
+        # migration, not from creation, so the first deploy does not find the whole backlog
+        # overdue and escalate it in one pass
+        for table in ('grievances', 'grievances_archive'):
+            _add_column_if_missing(conn, table, 'due_at', 'INTEGER')
+            _add_column_if_missing(conn, table, 'escalation_level', 'INTEGER DEFAULT 0')
+        conn.create_function('sla_due_at', 3, sla_due_at)
+        conn.execute('UPDATE grievances SET due_at = sla_due_at(priority, ?, status) WHERE due_at IS NULL', (now_ms(),))
+    
+    if version < 4:
+        # Analyses are reused per prompt mode; earlier ones did not record theirs, so they drop out of the cache
+        _add_column_if_missing(conn, 'ai_analyses', 'mode', 'TEXT')
+        conn.execute("DELETE FROM minhash_signatures WHERE kind = 'analysis'")
+        conn.execute("DELETE FROM lsh_buckets WHERE kind = 'analysis'")
+    
+    if version < 5:
+        # 'Critical' is the same level as 'Urgent' (priority_level); fold its trend buckets into 'Urgent'
+        conn.execute('''INSERT INTO daily_rollups (day, category, priority, department, opened, closed)
+                        SELECT day, category, 'Urgent', department, opened, closed
+                        FROM daily_rollups WHERE priority = 'Critical'
+                        ON CONFLICT (day, category, priority, department)
+                        DO UPDATE SET opened = opened + excluded.opened, closed = closed + excluded.closed''')
+        conn.execute("DELETE FROM daily_rollups WHERE priority = 'Critical'")
+    
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
 # User-related functions
 def create_user(name, email, password, role, department):
     """Create a new user in the database"""
@@ -93,12 +447,12 @@ def create_user(name, email, password, role, department):
     
     # Hash password and create user
     hashed_password = generate_password_hash(password)
-    user_id = str(uuid.uuid4())
+    user_id = ids.new_id()
     
     try:
         conn.execute(
-            'INSERT INTO users (id, name, email, password, role, department) VALUES (?, ?, ?, ?, ?, ?)',
-            (user_id, name, email, hashed_password, role, department)
+            'INSERT INTO users (id, name, email, password, role, department, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (user_id, name, email, hashed_password, role, department, now_ms())
         )
         conn.commit()
         
@@ -155,42 +509,76 @@ def get_users_by_department(department):
     
     return [dict(user) for user in users]
 
+def get_staff_open_loads():
+    """Open grievance counts per staff member and priority (staff with no open work get one row with 0)"""
+    placeholders = ', '.join('?' for _ in CLOSED_STATUSES)
+    conn = get_db_connection()
+    rows = conn.execute(
+        f'''SELECT u.id, u.department, g.priority, COUNT(g.id) AS open_count
+            FROM users u
+            LEFT JOIN grievances g ON g.assigned_to = u.id AND g.status NOT IN ({placeholders})
+            WHERE lower(u.role) = 'staff'
+            GROUP BY u.id, g.priority''',
+        CLOSED_STATUSES
+    ).fetchall()
+    conn.close()
+    
+    return [dict(row) for row in rows]
+
 # Grievance-related functions
-def create_grievance(title, description, category, priority, user_id, ai_summary=None, ai_recommendation=None):
+def create_grievance(title, description, category, priority, user_id, ai_summary=None, ai_recommendation=None,
+                     assigned_to=None, submitter_department=None):
     """Create a new grievance"""
-    conn = get_db_connection()
-    grievance_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
+    if submitter_department is None:
+        submitter = get_user_by_id(user_id)
+        submitter_department = submitter['department'] if submitter else None
     
-    try:
+    grievance_id = ids.new_id()
+    now = now_ms()
+    
+    # The row is built here rather than re-read after the insert
+    grievance = {
+        'id': grievance_id, 'title': title, 'description': description, 'category': category,
+        'priority': priority, 'status': 'New', 'submitted_by': user_id, 'assigned_to': assigned_to,
+        'ai_summary': ai_summary, 'ai_recommendation': ai_recommendation,
+        'created_at': now, 'updated_at': now, 'submitter_department': submitter_department,
+        'due_at': sla_due_at(priority, now), 'escalation_level': 0
+    }
+    
+    def write(conn):
         conn.execute(
             '''INSERT INTO grievances 
-               (id, title, description, category, priority, status, submitted_by, 
-                ai_summary, ai_recommendation, created_at, updated_at) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (grievance_id, title, description, category, priority, 'New', user_id, 
-             ai_summary, ai_recommendation, now, now)
+               (id, title, description, category, priority, status, submitted_by, assigned_to, 
+                ai_summary, ai_recommendation, created_at, updated_at, submitter_department, due_at) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (grievance_id, title, description, category, priority, 'New', user_id, assigned_to, 
+             ai_summary, ai_recommendation, now, now, submitter_department, grievance['due_at'])
         )
-        conn.commit()
-        
-        grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
-        conn.close()
-        
-        if grievance:
-            return dict(grievance), None
-        return None, "Failed to create grievance"
+        _log_change(conn, 'grievance.created', grievance_id, _grievance_summary(grievance))
+        _record_rollup(conn, grievance, rollup_day(now), opened=1)
+        _index_signature(conn, 'grievance', grievance_id, dedup.signature(title, description))
+    
+    try:
+        _run_write(write)
+        return grievance, None
     except Exception as e:
-        conn.close()
         return None, str(e)
 
-def get_grievance(grievance_id):
-    """Get a grievance by ID"""
+def get_grievance(grievance_id, include_archived=True):
+    """Get a grievance by ID, falling back to the archive for closed grievances"""
     conn = get_db_connection()
     grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
+    archived = False
+    
+    if not grievance and include_archived:
+        grievance = conn.execute('SELECT * FROM grievances_archive WHERE id = ?', (grievance_id,)).fetchone()
+        archived = grievance is not None
     conn.close()
     
     if grievance:
-        return dict(grievance)
+        grievance_dict = dict(grievance)
+        grievance_dict['archived'] = archived
+        return grievance_dict
     return None
 
 def update_grievance(grievance_id, updates):
@@ -205,19 +593,38 @@ def update_grievance(grievance_id, updates):
         return None, "No valid fields to update"
     
     # Add updated_at timestamp
-    filtered_updates['updated_at'] = datetime.now().isoformat()
-    
-    # Build the SQL query
-    set_clause = ', '.join([f"{field} = ?" for field in filtered_updates.keys()])
-    values = list(filtered_updates.values())
-    values.append(grievance_id)  # For the WHERE clause
+    filtered_updates['updated_at'] = now_ms()
     
     conn = get_db_connection()
     try:
+        current = None
+        if 'priority' in filtered_updates or 'status' in filtered_updates:
+            current = conn.execute('SELECT priority, status, created_at, due_at FROM grievances WHERE id = ?',
+                                   (grievance_id,)).fetchone()
+            if current:
+                filtered_updates['due_at'] = _updated_due_at(current, filtered_updates)
+        
+        # Build the SQL query
+        set_clause = ', '.join([f"{field} = ?" for field in filtered_updates.keys()])
+        values = list(filtered_updates.values())
+        values.append(grievance_id)  # For the WHERE clause
+        
         conn.execute(f"UPDATE grievances SET {set_clause} WHERE id = ?", values)
-        conn.commit()
         
         grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
+        if grievance:
+            _log_change(conn, 'grievance.updated', grievance_id, _grievance_summary(grievance))
+            if 'status' in filtered_updates and current:
+                # Closing counts towards today's closed bucket; reopening counts as newly opened work
+                was_closed = current['status'] in CLOSED_STATUSES
+                is_closed = grievance['status'] in CLOSED_STATUSES
+                if was_closed != is_closed:
+                    _record_rollup(conn, grievance, rollup_day(filtered_updates['updated_at']),
+                                   opened=int(was_closed), closed=int(is_closed))
+            if 'title' in filtered_updates or 'description' in filtered_updates:
+                _index_signature(conn, 'grievance', grievance_id,
+                                 dedup.signature(grievance['title'], grievance['description']))
+        conn.commit()
         conn.close()
         
         if grievance:
@@ -227,9 +634,65 @@ def update_grievance(grievance_id, updates):
         conn.close()
         return None, str(e)
 
-def get_grievances(filters=None, limit=50, offset=0):
-    """Get grievances with optional filters"""
-    query = "SELECT * FROM grievances"
+def _updated_due_at(current, updates):
+    """
+    SLA deadline after a priority or status change: cleared on close, restarted from now on reopen,
+    recounted from creation when the priority changes, otherwise unchanged.
+    """
+    priority = updates.get('priority', current['priority'])
+    status = updates.get('status', current['status'])
+    if status in CLOSED_STATUSES:
+        return None
+    if current['status'] in CLOSED_STATUSES:
+        return sla_due_at(priority, updates['updated_at'])
+    if priority != current['priority']:
+        return sla_due_at(priority, current['created_at'])
+    return current['due_at']
+
+def _grievance_source(include_archived):
+    """Return the FROM source for grievance list queries, optionally including the archive"""
+    if not include_archived:
+        return "grievances"
+    columns = ', '.join(GRIEVANCE_COLUMNS)
+    return f"(SELECT {columns} FROM grievances UNION ALL SELECT {columns} FROM grievances_archive)"
+
+def _iter_rows(query, params=()):
+    """Yield query rows as dicts, fetching in batches so large results are never fully materialized"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+def _grievance_projection(fields, alias=None):
+    """
+    Build the SELECT column list for a grievance listing.
+    `fields` is a list of column names, ['all'] for every column, or None for the compact list columns.
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        columns = GRIEVANCE_LIST_COLUMNS
+    elif list(fields) == ['all']:
+        columns = GRIEVANCE_COLUMNS
+    else:
+        unknown = [field for field in fields if field not in GRIEVANCE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # Always include the id so rows can be linked to their detail view
+        columns = ['id'] + [field for field in dict.fromkeys(fields) if field != 'id']
+    
+    prefix = f"{alias}." if alias else ""
+    return ', '.join(prefix + column for column in columns)
+
+def _grievances_query(filters, limit, offset, include_archived, fields=None):
+    """Build the query and parameters for a filtered grievance listing"""
+    query = f"SELECT {_grievance_projection(fields)} FROM {_grievance_source(include_archived)}"
     params = []
     
     if filters:
@@ -238,6 +701,12 @@ def get_grievances(filters=None, limit=50, offset=0):
             if key in ['status', 'category', 'priority', 'submitted_by', 'assigned_to']:
                 conditions.append(f"{key} = ?")
                 params.append(value)
+            elif key == 'from':
+                conditions.append("created_at >= ?")
+                params.append(value)
+            elif key == 'to':
+                conditions.append("created_at < ?")
+                params.append(value)
         
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
@@ -245,81 +714,269 @@ def get_grievances(filters=None, limit=50, offset=0):
     query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
     
-    conn = get_db_connection()
-    grievances = conn.execute(query, params).fetchall()
-    conn.close()
+    return query, params
+
+def iter_grievances(filters=None, limit=50, offset=0, include_archived=False, fields=None):
+    """Stream grievances with optional filters"""
+    return _iter_rows(*_grievances_query(filters, limit, offset, include_archived, fields))
+
+def get_grievances(filters=None, limit=50, offset=0, include_archived=False, fields=('all',)):
+    """Get grievances with optional filters"""
+    return list(iter_grievances(filters, limit, offset, include_archived, fields))
+
+def _user_grievances_query(user_id, role, limit, offset, include_archived, fields=None, department=None):
+    """Build the query and parameters for the grievances visible to a user, or None if there are none"""
+    source = _grievance_source(include_archived)
+    columns = _grievance_projection(fields)
+    
+    if role.lower() in ['admin', 'manager']:
+        # Admins and managers can see all grievances
+        return (f'SELECT {columns} FROM {source} ORDER BY created_at DESC LIMIT ? OFFSET ?',
+                (limit, offset))
+    
+    if role.lower() == 'staff':
+        # Staff can see grievances assigned to them or from their department.
+        # Each UNION branch is an ordered scan of its own index, cut at limit + offset rows.
+        if department is None:
+            user = get_user_by_id(user_id)
+            if not user:
+                return None
+            department = user.get('department')
+        
+        window = limit + offset
+        return (f'''SELECT {_grievance_projection(fields, 'g')} FROM {source} g
+               JOIN (
+                   SELECT id, created_at FROM (
+                       SELECT id, created_at FROM {source} WHERE assigned_to = ?
+                       ORDER BY created_at DESC LIMIT ?)
+                   UNION
+                   SELECT id, created_at FROM (
+                       SELECT id, created_at FROM {source} WHERE submitter_department = ? AND status != 'Closed'
+                       ORDER BY created_at DESC LIMIT ?)
+                   ORDER BY created_at DESC LIMIT ? OFFSET ?
+               ) page ON g.id = page.id
+               ORDER BY page.created_at DESC''',
+                (user_id, window, department, window, limit, offset))
     
-    return [dict(g) for g in grievances]
+    # Regular users can only see their own grievances
+    return (f'SELECT {columns} FROM {source} WHERE submitted_by = ? ORDER BY created_at DESC LIMIT ? OFFSET ?',
+            (user_id, limit, offset))
 
-def get_user_grievances(user_id, role, limit=50, offset=0):
+def iter_user_grievances(user_id, role, limit=50, offset=0, include_archived=False, fields=None, department=None):
+    """Stream grievances relevant to a user based on their role"""
+    query = _user_grievances_query(user_id, role, limit, offset, include_archived, fields, department)
+    if query is None:
+        return iter(())
+    return _iter_rows(*query)
+
+def get_user_grievances(user_id, role, limit=50, offset=0, include_archived=False, fields=('all',), department=None):
     """Get grievances relevant to a user based on their role"""
+    return list(iter_user_grievances(user_id, role, limit, offset, include_archived, fields, department))
+
+# SLA functions
+def get_next_due_at():
+    """Earliest SLA deadline among open grievances, or None (a single index seek)"""
     conn = get_db_connection()
+    row = conn.execute('SELECT MIN(due_at) AS due_at FROM grievances WHERE due_at IS NOT NULL').fetchone()
+    conn.close()
+    return row['due_at']
+
+def get_due_grievances(now, limit):
+    """Open grievances whose deadline has passed, most overdue first (for the escalation scheduler)"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        '''SELECT id, priority, status, assigned_to, submitter_department, due_at, escalation_level
+           FROM grievances WHERE due_at IS NOT NULL AND due_at <= ?
+           ORDER BY due_at LIMIT ?''',
+        (now, limit)
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def escalate_grievance(grievance_id, expected_due_at, priority, assigned_to, due_at):
+    """
+    Escalate an overdue grievance: new priority, assignee and deadline, escalation_level + 1.
+    The update only applies while the row still has `expected_due_at`, so concurrent schedulers
+    (one per worker) escalate each deadline once. Returns the updated row, or None if another
+    scheduler claimed it or the grievance changed in the meantime.
+    """
+    def write(conn):
+        cursor = conn.execute(
+            '''UPDATE grievances
+               SET priority = ?, assigned_to = ?, due_at = ?, escalation_level = escalation_level + 1,
+                   updated_at = ?
+               WHERE id = ? AND due_at = ?''',
+            (priority, assigned_to, due_at, now_ms(), grievance_id, expected_due_at)
+        )
+        if cursor.rowcount == 0:
+            return None
+        grievance = conn.execute('SELECT * FROM grievances WHERE id = ?', (grievance_id,)).fetchone()
+        _log_change(conn, 'grievance.escalated', grievance_id, _grievance_summary(grievance))
+        return dict(grievance)
     
+    return _run_write(write)
+
+def _overdue_grievances_query(user_id, role, department, now, limit, offset, fields=None):
+    """Build the query for overdue grievances visible to a user, walking the due_at index in deadline order"""
+    query = f"SELECT {_grievance_projection(fields)} FROM grievances WHERE due_at IS NOT NULL AND due_at <= ?"
+    params = [now]
+    
+    # The unary + keeps the planner on idx_grievances_due: the overdue set is small, while the
+    # assignee/department indexes would walk every grievance (open or closed) of that user
     if role.lower() in ['admin', 'manager']:
-        # Admins and managers can see all grievances
-        grievances = conn.execute(
-            'SELECT * FROM grievances ORDER BY created_at DESC LIMIT ? OFFSET ?',
-            (limit, offset)
-        ).fetchall()
+        pass
     elif role.lower() == 'staff':
-        # Staff can see grievances assigned to them or from their department
-        user = get_user_by_id(user_id)
-        if not user:
-            conn.close()
-            return []
-        
-        grievances = conn.execute(
-            '''SELECT g.* FROM grievances g
-               JOIN users u ON g.submitted_by = u.id
-               WHERE g.assigned_to = ? OR (u.department = ? AND g.status != 'Closed')
-               ORDER BY g.created_at DESC LIMIT ? OFFSET ?''',
-            (user_id, user.get('department'), limit, offset)
-        ).fetchall()
+        query += ' AND (+assigned_to = ? OR +submitter_department = ?)'
+        params.extend([user_id, department])
     else:
-        # Regular users can only see their own grievances
-        grievances = conn.execute(
-            'SELECT * FROM grievances WHERE submitted_by = ? ORDER BY created_at DESC LIMIT ? OFFSET ?',
-            (user_id, limit, offset)
-        ).fetchall()
+        query += ' AND +submitted_by = ?'
+        params.append(user_id)
+    
+    query += ' ORDER BY due_at LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+    return query, params
+
+def iter_overdue_grievances(user_id, role, department=None, limit=50, offset=0, fields=None):
+    """Stream open grievances past their SLA deadline, most overdue first"""
+    return _iter_rows(*_overdue_grievances_query(user_id, role, department, now_ms(), limit, offset, fields))
+
+# Rollup functions
+def rollup_day(epoch_ms):
+    """UTC day number (days since 1970-01-01) of an epoch-ms timestamp"""
+    return epoch_ms // MS_PER_DAY
+
+def rollup_priority(priority):
+    """Priority level without its description, so 'High' and 'High - Needs ...' (and 'Critical' and 'Urgent') share a bucket"""
+    return priority_level(priority).capitalize()
+
+def _record_rollup(conn, grievance, day, opened=0, closed=0):
+    """Add to a grievance's daily bucket inside the caller's transaction"""
+    conn.execute(
+        '''INSERT INTO daily_rollups (day, category, priority, department, opened, closed)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (day, category, priority, department)
+           DO UPDATE SET opened = opened + excluded.opened, closed = closed + excluded.closed''',
+        (day, grievance['category'], rollup_priority(grievance['priority']),
+         grievance['submitter_department'] or '', opened, closed)
+    )
+
+def get_daily_rollups(start_day, end_day, group_by=None, department=None):
+    """
+    Opened/closed counts per day in [start_day, end_day), summed per `group_by` value
+    (one of ROLLUP_DIMENSIONS, or None for a single 'all' series). Raises ValueError for
+    an unknown dimension.
+    """
+    if group_by is not None and group_by not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"group_by must be one of: {', '.join(ROLLUP_DIMENSIONS)}")
+    key = group_by or "'all'"
+    
+    query = f'''SELECT day, {key} AS key, SUM(opened) AS opened, SUM(closed) AS closed
+                FROM daily_rollups WHERE day >= ? AND day < ?'''
+    params = [start_day, end_day]
+    if department is not None:
+        query += ' AND department = ?'
+        params.append(department)
+    query += ' GROUP BY day, key'
     
+    conn = get_db_connection()
+    rows = conn.execute(query, params).fetchall()
     conn.close()
-    return [dict(g) for g in grievances]
+    return [dict(row) for row in rows]
+
+def rebuild_daily_rollups():
+    """
+    Recompute every daily bucket from the live and archive tables. Grievances have no close
+    timestamp, so a closed grievance counts as closed on the day it was last updated.
+    Returns the number of buckets written.
+    """
+    source = _grievance_source(include_archived=True)
+    placeholders = ', '.join('?' for _ in CLOSED_STATUSES)
+    
+    def write(conn):
+        conn.create_function('rollup_priority', 1, rollup_priority)
+        conn.execute('DELETE FROM daily_rollups')
+        cursor = conn.execute(
+            f'''INSERT INTO daily_rollups (day, category, priority, department, opened, closed)
+                SELECT day, category, priority, department, SUM(opened), SUM(closed) FROM (
+                    SELECT created_at / {MS_PER_DAY} AS day, category, rollup_priority(priority) AS priority,
+                           COALESCE(submitter_department, '') AS department, 1 AS opened, 0 AS closed
+                    FROM {source}
+                    UNION ALL
+                    SELECT updated_at / {MS_PER_DAY}, category, rollup_priority(priority),
+                           COALESCE(submitter_department, ''), 0, 1
+                    FROM {source} WHERE status IN ({placeholders})
+                )
+                GROUP BY day, category, priority, department''',
+            CLOSED_STATUSES
+        )
+        return cursor.rowcount
+    
+    return _run_write(write)
 
 # Comment functions
 def add_comment(grievance_id, user_id, content):
     """Add a comment to a grievance"""
-    conn = get_db_connection()
-    comment_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
+    comment_id = ids.new_id()
+    now = now_ms()
+    comment = {'id': comment_id, 'grievance_id': grievance_id, 'user_id': user_id,
+               'content': content, 'created_at': now}
     
-    try:
+    def write(conn):
         conn.execute(
             'INSERT INTO comments (id, grievance_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)',
             (comment_id, grievance_id, user_id, content, now)
         )
-        conn.commit()
-        
-        comment = conn.execute('SELECT * FROM comments WHERE id = ?', (comment_id,)).fetchone()
-        conn.close()
-        
-        if comment:
-            return dict(comment), None
-        return None, "Failed to add comment"
+        _log_change(conn, 'comment.created', grievance_id, comment)
+    
+    try:
+        _run_write(write)
+        return comment, None
     except Exception as e:
-        conn.close()
         return None, str(e)
 
-def get_grievance_comments(grievance_id):
-    """Get all comments for a grievance"""
-    conn = get_db_connection()
-    comments = conn.execute(
-        '''SELECT c.*, u.name as user_name 
-           FROM comments c
+def encode_comment_cursor(comment):
+    """Build an opaque cursor pointing just after the given comment"""
+    raw = f"{comment['created_at']}|{comment['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_comment_cursor(cursor):
+    """Decode a comment cursor into (created_at, id). Raises ValueError if it is malformed."""
+    try:
+        created_at, comment_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        created_at = int(created_at)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, comment_id
+
+def get_grievance_comments(grievance_id, since=None, limit=None, archived=None):
+    """
+    Get comments for a grievance in chronological order.
+    `since` is a cursor from a previous call; only newer comments are returned.
+    `archived` selects the live (False) or archive (True) table; None tries live, then archive.
+    """
+    query = '''SELECT c.*, u.name as user_name 
+           FROM {table} c
            JOIN users u ON c.user_id = u.id
-           WHERE c.grievance_id = ?
-           ORDER BY c.created_at ASC''',
-        (grievance_id,)
-    ).fetchall()
+           WHERE c.grievance_id = ?'''
+    params = [grievance_id]
+    
+    if since:
+        query += " AND (c.created_at, c.id) > (?, ?)"
+        params.extend(decode_comment_cursor(since))
+    
+    query += " ORDER BY c.created_at ASC, c.id ASC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    conn = get_db_connection()
+    comments = []
+    if not archived:
+        comments = conn.execute(query.format(table='comments'), params).fetchall()
+    
+    if archived or (archived is None and not comments and not since):
+        # Comments of archived grievances live in the archive table
+        comments = conn.execute(query.format(table='comments_archive'), params).fetchall()
     conn.close()
     
     return [dict(c) for c in comments]
@@ -327,24 +984,22 @@ def get_grievance_comments(grievance_id):
 # Attachment functions
 def add_attachment(grievance_id, file_name, file_path, user_id):
     """Add an attachment to a grievance"""
-    conn = get_db_connection()
-    attachment_id = str(uuid.uuid4())
+    attachment_id = ids.new_id()
+    now = now_ms()
+    attachment = {'id': attachment_id, 'grievance_id': grievance_id, 'file_name': file_name,
+                  'file_path': file_path, 'uploaded_by': user_id, 'created_at': now}
     
-    try:
+    def write(conn):
         conn.execute(
-            'INSERT INTO attachments (id, grievance_id, file_name, file_path, uploaded_by) VALUES (?, ?, ?, ?, ?)',
-            (attachment_id, grievance_id, file_name, file_path, user_id)
+            'INSERT INTO attachments (id, grievance_id, file_name, file_path, uploaded_by, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (attachment_id, grievance_id, file_name, file_path, user_id, now)
         )
-        conn.commit()
-        
-        attachment = conn.execute('SELECT * FROM attachments WHERE id = ?', (attachment_id,)).fetchone()
-        conn.close()
-        
-        if attachment:
-            return dict(attachment), None
-        return None, "Failed to add attachment"
+        _log_change(conn, 'attachment.created', grievance_id, attachment)
+    
+    try:
+        _run_write(write)
+        return attachment, None
     except Exception as e:
-        conn.close()
         return None, str(e)
 
 def get_grievance_attachments(grievance_id):
@@ -354,17 +1009,314 @@ def get_grievance_attachments(grievance_id):
         'SELECT * FROM attachments WHERE grievance_id = ? ORDER BY created_at DESC',
         (grievance_id,)
     ).fetchall()
+    
+    if not attachments:
+        attachments = conn.execute(
+            'SELECT * FROM attachments_archive WHERE grievance_id = ? ORDER BY created_at DESC',
+            (grievance_id,)
+        ).fetchall()
     conn.close()
     
     return [dict(a) for a in attachments]
 
-def view_grievence():
+# Change log functions
+def _grievance_summary(grievance):
+    """Compact representation of a grievance row used in change events"""
+    return {column: grievance[column] for column in GRIEVANCE_LIST_COLUMNS}
+
+def _log_change(conn, event, grievance_id, payload):
+    """Append a change event inside the caller's transaction"""
+    conn.execute(
+        '''INSERT INTO change_log 
+           (event, grievance_id, submitted_by, assigned_to, department, status, payload, created_at)
+           SELECT ?, id, submitted_by, assigned_to, submitter_department, status, ?, ?
+           FROM grievances
+           WHERE id = ?''',
+        (event, json.dumps(payload), now_ms(), grievance_id)
+    )
+
+def get_latest_change_id():
+    """Return the id of the newest change event (0 when the log is empty)"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT MAX(id) AS id FROM change_log').fetchone()
+    conn.close()
+    return row['id'] or 0
+
+def get_changes(user_id, role, department, after_id, limit=100):
+    """Get change events newer than `after_id` visible to a user (same rules as get_user_grievances)"""
+    query = 'SELECT id, event, grievance_id, payload FROM change_log WHERE id > ?'
+    params = [after_id]
+    
+    if role.lower() in ['admin', 'manager']:
+        pass
+    elif role.lower() == 'staff':
+        query += " AND (assigned_to = ? OR (department = ? AND status != 'Closed'))"
+        params.extend([user_id, department])
+    else:
+        query += ' AND submitted_by = ?'
+        params.append(user_id)
+    
+    query += ' ORDER BY id ASC LIMIT ?'
+    params.append(limit)
+    
+    conn = get_db_connection()
+    changes = conn.execute(query, params).fetchall()
+    conn.close()
+    
+    return [dict(c) for c in changes]
+
+def get_change_feed(after_id, limit=500):
+    """Change events newer than `after_id` for every user, with the columns change_visible() needs"""
+    conn = get_db_connection()
+    changes = conn.execute(
+        '''SELECT id, event, grievance_id, submitted_by, assigned_to, department, status, payload
+           FROM change_log WHERE id > ? ORDER BY id ASC LIMIT ?''',
+        (after_id, limit)
+    ).fetchall()
+    conn.close()
+    return [dict(c) for c in changes]
+
+def change_visible(change, user_id, role, department):
+    """Whether a get_change_feed() event is visible to a user (the rules get_changes applies in SQL)"""
+    role = role.lower()
+    if role in ['admin', 'manager']:
+        return True
+    if role == 'staff':
+        return change['assigned_to'] == user_id or (change['department'] == department and
+                                                    change['status'] != 'Closed')
+    return change['submitted_by'] == user_id
+
+def prune_change_log(older_than_days):
+    """Delete change events older than the given age. Returns the number removed."""
+    cutoff = days_ago_ms(older_than_days)
+    conn = get_db_connection()
+    removed = conn.execute('DELETE FROM change_log WHERE created_at < ?', (cutoff,)).rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+# Near-duplicate detection functions
+def _index_signature(conn, kind, item_id, signature):
+    """Store a MinHash signature and its LSH buckets inside the caller's transaction"""
+    conn.execute('INSERT OR REPLACE INTO minhash_signatures (kind, item_id, signature) VALUES (?, ?, ?)',
+                 (kind, item_id, dedup.to_blob(signature)))
+    conn.execute('DELETE FROM lsh_buckets WHERE kind = ? AND item_id = ?', (kind, item_id))
+    conn.executemany('INSERT OR IGNORE INTO lsh_buckets (kind, band, bucket, item_id) VALUES (?, ?, ?, ?)',
+                     [(kind, band, bucket, item_id) for band, bucket in dedup.band_buckets(signature)])
+
+def _remove_signatures(conn, kind, item_ids):
+    """Drop signatures and buckets for the given items inside the caller's transaction"""
+    placeholders = ', '.join('?' for _ in item_ids)
+    conn.execute(f'DELETE FROM minhash_signatures WHERE kind = ? AND item_id IN ({placeholders})', [kind, *item_ids])
+    conn.execute(f'DELETE FROM lsh_buckets WHERE kind = ? AND item_id IN ({placeholders})', [kind, *item_ids])
+
+def _find_similar(conn, kind, signature, threshold, limit, exclude_id=None):
+    """Return [(item_id, similarity)] for items sharing an LSH bucket and above the threshold (limit None: all)"""
+    buckets = dedup.band_buckets(signature)
+    values = ', '.join('(?, ?)' for _ in buckets)
+    params = [kind] + [value for pair in buckets for value in pair] + [kind]
+    
+    candidates = conn.execute(
+        f'''SELECT s.item_id, s.signature FROM minhash_signatures s
+            WHERE s.item_id IN (
+                SELECT DISTINCT item_id FROM lsh_buckets
+                WHERE kind = ? AND (band, bucket) IN (VALUES {values})
+            ) AND s.kind = ?''',
+        params
+    ).fetchall()
+    
+    matches = []
+    for candidate in candidates:
+        if candidate['item_id'] == exclude_id:
+            continue
+        score = dedup.similarity(signature, dedup.from_blob(candidate['signature']))
+        if score >= threshold:
+            matches.append((candidate['item_id'], score))
+    
+    matches.sort(key=lambda match: match[1], reverse=True)
+    return matches[:limit]
+
+def _grievance_visibility(user_id, role, department):
+    """WHERE clause and parameters limiting grievances to those a user may see (get_user_grievances rules)"""
+    if role.lower() in ['admin', 'manager']:
+        return '1=1', []
+    if role.lower() == 'staff':
+        return ("(assigned_to = ? OR (submitter_department = ? AND status != 'Closed'))",
+                [user_id, department])
+    return 'submitted_by = ?', [user_id]
+
+def find_duplicate_grievances(title, description, user_id, role, department=None, threshold=None, limit=5,
+                              exclude_id=None):
+    """
+    Find grievances that are likely duplicates of the given text, most similar first.
+    Only grievances the user may see are returned.
+    """
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    signature = dedup.signature(title, description)
+    visibility, visibility_params = _grievance_visibility(user_id, role, department)
+    
+    conn = get_db_connection()
+    # Matches are filtered by visibility afterwards, so rank every candidate rather than the top `limit`
+    matches = _find_similar(conn, 'grievance', signature, threshold, None, exclude_id)
+    
+    duplicates = []
+    for grievance_id, score in matches:
+        grievance = conn.execute(
+            f'SELECT id, title, category, status, created_at FROM grievances WHERE id = ? AND {visibility}',
+            [grievance_id] + visibility_params
+        ).fetchone()
+        if grievance:
+            duplicates.append({**dict(grievance), 'similarity': round(score, 3)})
+            if len(duplicates) >= limit:
+                break
+    conn.close()
+    
+    return duplicates
+
+def _analysis_kind(mode):
+    """LSH kind of stored analyses: keyed by prompt mode, since a classify answer cannot serve a full request"""
+    return f'analysis:{mode}'
+
+def save_ai_analysis(title, description, response_text, category, priority, mode):
+    """Store an AI analysis so near-identical submissions in the same prompt mode can reuse it"""
+    analysis_id = ids.new_id()
+    
+    def write(conn):
+        conn.execute(
+            '''INSERT INTO ai_analyses (id, title, description, response_text, category, priority, created_at, mode)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            (analysis_id, title, description, response_text, category, priority, now_ms(), mode)
+        )
+        _index_signature(conn, _analysis_kind(mode), analysis_id, dedup.signature(title, description))
+    
+    _run_write(write)
+    return analysis_id
+
+def find_reusable_analysis(title, description, mode, threshold=None):
+    """
+    Return the category and priority (and similarity) of the stored AI analysis, made in the
+    same prompt mode, of the most similar earlier submission above the threshold, or None.
+    Its text is not returned: it belongs to another submission.
+    """
+    threshold = ANALYSIS_REUSE_THRESHOLD if threshold is None else threshold
+    signature = dedup.signature(title, description)
+    
+    conn = get_db_connection()
+    matches = _find_similar(conn, _analysis_kind(mode), signature, threshold, 1)
+    analysis = None
+    if matches:
+        row = conn.execute('''SELECT category, priority FROM ai_analyses
+                              WHERE id = ? AND category IS NOT NULL AND priority IS NOT NULL''',
+                           (matches[0][0],)).fetchone()
+        if row:
+            analysis = {**dict(row), 'similarity': round(matches[0][1], 3)}
+    conn.close()
+    
+    return analysis
+
+def record_ai_usage(mode, input_tokens, output_tokens, latency_ms):
+    """Record token counts and latency of one AI call"""
+    def write(conn):
+        conn.execute(
+            'INSERT INTO ai_usage (mode, input_tokens, output_tokens, latency_ms, created_at) VALUES (?, ?, ?, ?, ?)',
+            (mode, input_tokens, output_tokens, round(latency_ms, 1), now_ms())
+        )
+    
+    _run_write(write)
+
+def backfill_grievance_signatures(batch_size=500):
+    """Compute signatures for grievances that do not have one yet. Returns the number indexed."""
+    indexed = 0
     conn = get_db_connection()
-    grievances = conn.execute('SELECT * FROM grievances').fetchall()
+    try:
+        while True:
+            rows = conn.execute(
+                '''SELECT g.id, g.title, g.description FROM grievances g
+                   WHERE NOT EXISTS (SELECT 1 FROM minhash_signatures s WHERE s.kind = 'grievance' AND s.item_id = g.id)
+                   LIMIT ?''',
+                (batch_size,)
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                _index_signature(conn, 'grievance', row['id'], dedup.signature(row['title'], row['description']))
+            conn.commit()
+            indexed += len(rows)
+    finally:
+        conn.close()
+    return indexed
+
+def compact_database():
+    """
+    VACUUM the database. Rows keyed by legacy uuid4 ids keep their ids (they appear in URLs);
+    rebuilding packs the pages and indexes they fragmented.
+    """
+    conn = get_db_connection()
+    conn.execute('VACUUM')
     conn.close()
 
+# Archival functions
+def archive_closed_grievances(older_than_days=None, batch_size=None):
+    """Move grievances closed for longer than `older_than_days` (with their comments and
+    attachments) into the archive tables, one batch per transaction. Returns the number archived."""
+    older_than_days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = ARCHIVE_BATCH_SIZE if batch_size is None else batch_size
+    cutoff = days_ago_ms(older_than_days)
+    
+    grievance_columns = ', '.join(GRIEVANCE_COLUMNS)
+    comment_columns = ', '.join(COMMENT_COLUMNS)
+    attachment_columns = ', '.join(ATTACHMENT_COLUMNS)
+    
+    conn = get_db_connection()
+    archived = 0
+    
+    try:
+        while True:
+            batch_ids = [row['id'] for row in conn.execute(
+                f"SELECT id FROM grievances WHERE status IN ({CLOSED_STATUSES_SQL}) AND updated_at < ? LIMIT ?",
+                (cutoff, batch_size)
+            ).fetchall()]
+            
+            if not batch_ids:
+                break
+            
+            placeholders = ', '.join('?' for _ in batch_ids)
+            conn.execute(f'''INSERT OR REPLACE INTO comments_archive ({comment_columns})
+                             SELECT {comment_columns} FROM comments WHERE grievance_id IN ({placeholders})''', batch_ids)
+            conn.execute(f'''INSERT OR REPLACE INTO attachments_archive ({attachment_columns})
+                             SELECT {attachment_columns} FROM attachments WHERE grievance_id IN ({placeholders})''', batch_ids)
+            conn.execute(f'''INSERT OR REPLACE INTO grievances_archive ({grievance_columns})
+                             SELECT {grievance_columns} FROM grievances WHERE id IN ({placeholders})''', batch_ids)
+            conn.execute(f'DELETE FROM comments WHERE grievance_id IN ({placeholders})', batch_ids)
+            conn.execute(f'DELETE FROM attachments WHERE grievance_id IN ({placeholders})', batch_ids)
+            conn.execute(f'DELETE FROM grievances WHERE id IN ({placeholders})', batch_ids)
+            _remove_signatures(conn, 'grievance', batch_ids)
+            conn.commit()
+            
+            archived += len(batch_ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    return archived
+
+def iter_all_grievances():
+    """Stream every grievance"""
+    return _iter_rows('SELECT * FROM grievances')
+
+def iter_training_rows():
+    """Stream labelled grievances (live and archived) for training the local classifier"""
+    return _iter_rows(
+        '''SELECT title, description, category, priority FROM grievances
+           UNION ALL
+           SELECT title, description, category, priority FROM grievances_archive'''
+    )
+
+def view_grievence():
     # Convert grievances to a list of dictionaries
-    grievance_list = [dict(g) for g in grievances]
+    grievance_list = list(iter_all_grievances())
     
     print(grievance_list)  # Now it prints actual data
     return grievance_list
@@ -397,6 +1349,9 @@ def update_profile(user_id, updates):
 
     if "department" in updates:        
         conn.execute('UPDATE users SET department = ? WHERE id = ?', (updates["department"], user_id))
+        # Keep the denormalized copy on the user's grievances in sync
+        conn.execute('UPDATE grievances SET submitter_department = ? WHERE submitted_by = ?', (updates["department"], user_id))
+        conn.execute('UPDATE grievances_archive SET submitter_department = ? WHERE submitted_by = ?', (updates["department"], user_id))
     
     if "password" in updates:
         conn.execute('UPDATE users SET password = ? WHERE id = ?', (generate_password_hash(updates["password"]), user_id))
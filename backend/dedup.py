@@ -0,0 +1,71 @@
+import re
+import threading
+import zlib
+
+# MinHash / LSH parameters. With 16 bands of 4 rows, pairs above ~0.5 Jaccard
+# similarity are very likely to share at least one bucket.
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+# Fixed seed so signatures stay comparable across processes and restarts
+HASH_SEED = 20240305
+
+_WORD_RE = re.compile(r'\w+')
+
+# NumPy takes a noticeable share of worker start-up, so it is imported on first use
+_lock = threading.Lock()
+_hash_params = None
+
+def _get_hash_params():
+    """Multiply-shift parameters (a, b) for every permutation, built once"""
+    global _hash_params
+    if _hash_params is None:
+        with _lock:
+            if _hash_params is None:
+                import numpy as np
+                rng = np.random.default_rng(HASH_SEED)
+                a = rng.integers(1, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+                b = rng.integers(0, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64)
+                _hash_params = (a, b)
+    return _hash_params
+
+def shingles(text):
+    """Hashed word n-grams of the normalized text"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = words
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+def signature(title, description):
+    """MinHash signature (uint32 array) for a grievance's title and description"""
+    import numpy as np
+    hashed = shingles(f"{title or ''} {description or ''}")
+    if not hashed:
+        return np.full(NUM_PERMUTATIONS, 0xFFFFFFFF, dtype=np.uint32)
+    
+    a, b = _get_hash_params()
+    values = np.fromiter(hashed, dtype=np.uint64, count=len(hashed))
+    # Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, vectorized over all permutations
+    with np.errstate(over='ignore'):
+        hashes = (values[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+    return hashes.min(axis=0).astype(np.uint32)
+
+def band_buckets(sig):
+    """LSH bucket key for each band of a signature"""
+    return [(band, zlib.crc32(sig[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()))
+            for band in range(LSH_BANDS)]
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float((sig_a == sig_b).sum()) / NUM_PERMUTATIONS
+
+def to_blob(sig):
+    return sig.astype('uint32').tobytes()
+
+def from_blob(blob):
+    import numpy as np
+    return np.frombuffer(blob, dtype=np.uint32)
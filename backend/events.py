@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+import time
+import db
+
+# Live change feed fan-out. One poller thread per process reads new change_log rows and
+# hands them to every open event stream, so the database sees one query per interval no
+# matter how many dashboards are connected; the thread exits once the last stream closes.
+# Each open stream still occupies a server thread, so a worker serves at most
+# EVENT_MAX_STREAMS of them (server.py adds that many threads on top of WEB_THREADS).
+EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 1.0))
+EVENT_MAX_STREAMS = int(os.getenv('EVENT_MAX_STREAMS', 32))
+# Events buffered per stream; a stream that falls further behind is closed and catches up on reconnect
+EVENT_QUEUE_SIZE = 1000
+FEED_BATCH_SIZE = 500
+
+class Subscription:
+    """Queue of change events for one open stream"""
+
+    def __init__(self):
+        self.queue = queue.Queue(EVENT_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, change):
+        try:
+            self.queue.put_nowait(change)
+        except queue.Full:
+            self.overflowed = True
+
+_lock = threading.Lock()
+_subscribers = set()
+_thread = None
+_pid = None
+_last_id = 0
+
+def subscribe():
+    """Register a stream, or return None when this worker already serves EVENT_MAX_STREAMS"""
+    global _thread, _pid, _last_id
+    with _lock:
+        if len(_subscribers) >= EVENT_MAX_STREAMS:
+            return None
+        subscription = Subscription()
+        _subscribers.add(subscription)
+        # Threads do not survive fork, so the poller is tracked per process
+        if _thread is None or _pid != os.getpid():
+            _pid = os.getpid()
+            _last_id = db.get_latest_change_id()
+            _thread = threading.Thread(target=_run, name='change-feed', daemon=True)
+            _thread.start()
+    return subscription
+
+def unsubscribe(subscription):
+    """Remove a stream (safe to call more than once)"""
+    with _lock:
+        _subscribers.discard(subscription)
+
+def _poll():
+    global _last_id
+    while True:
+        changes = db.get_change_feed(_last_id, FEED_BATCH_SIZE)
+        if changes:
+            _last_id = changes[-1]['id']
+            with _lock:
+                subscribers = list(_subscribers)
+            for change in changes:
+                for subscription in subscribers:
+                    subscription.put(change)
+        if len(changes) < FEED_BATCH_SIZE:
+            return
+
+def _run():
+    global _thread
+    while True:
+        time.sleep(EVENT_POLL_INTERVAL)
+        with _lock:
+            if not _subscribers:
+                _thread = None
+                return
+        try:
+            _poll()
+        except Exception as e:
+            print(f"Change feed error: {e}")
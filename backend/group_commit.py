@@ -0,0 +1,91 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class GroupCommitWriter:
+    """
+    Coalesces writes submitted from many threads into a single transaction.
+
+    Each submitted write is a callable taking a connection. Writes arriving within
+    `window_ms` of the first one are executed together (each in its own savepoint,
+    so one failing write does not abort the others) and committed once. Callers
+    get a Future that resolves only after the batch has been durably committed.
+    """
+
+    def __init__(self, connect, window_ms=5, max_batch=256):
+        self._connect = connect
+        self._window = window_ms / 1000.0
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, write):
+        """Queue a write and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def start(self):
+        """Start the writer thread for this process (otherwise started on first submit)"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker process starts its own writer
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        conn.isolation_level = None  # transactions are managed explicitly below
+        while True:
+            batch = self._collect_batch()
+            results = []
+            try:
+                conn.execute('BEGIN')
+                for write, future in batch:
+                    conn.execute('SAVEPOINT write')
+                    try:
+                        results.append((future, write(conn), None))
+                        conn.execute('RELEASE write')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO write')
+                        conn.execute('RELEASE write')
+                        results.append((future, None, e))
+                conn.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            # Acknowledge callers only after the commit succeeded
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
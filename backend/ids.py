@@ -0,0 +1,36 @@
+import os
+import threading
+import time
+
+# Time-ordered identifiers in the ULID layout: a 48-bit millisecond timestamp
+# followed by 80 random bits, written as 26 Crockford base32 characters.
+# New rows get ids that sort by creation time, so inserts append to the end of
+# the primary key index instead of landing at random positions. They are also
+# shorter than the 36-character uuid4 strings used by older rows, which stay valid.
+_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+def new_id():
+    """Return a new 26-character time-ordered id (monotonic within a process)"""
+    global _last_ms, _last_random
+    now_ms = time.time_ns() // 1_000_000
+    with _lock:
+        if now_ms <= _last_ms:
+            # Same millisecond (or clock went backwards): increment to keep ids ordered
+            now_ms = _last_ms
+            random_part = (_last_random + 1) % (1 << _RANDOM_BITS)
+        else:
+            random_part = int.from_bytes(os.urandom(10), 'big')
+        _last_ms, _last_random = now_ms, random_part
+    return _encode((now_ms << _RANDOM_BITS) | random_part, 26)
@@ -0,0 +1,113 @@
+# Prompt construction and token budgeting for AI grievance analysis
+
+CATEGORIES = [
+    "Public Infrastructure & Utilities",
+    "Government Services & Administration",
+    "Consumer Rights & Product Issues",
+    "Workplace & Employment Issues",
+    "Education & Student Concerns",
+    "Healthcare & Medical Services",
+    "Law Enforcement & Justice",
+    "Environmental & Safety Issues",
+    "Housing & Real Estate",
+    "Transportation & Public Safety",
+    "Financial & Banking Issues",
+    "Other"
+]
+
+PRIORITY_LEVELS = [
+    "Low - Minor issue, no immediate action required",
+    "Medium - Requires attention within a week",
+    "High - Needs immediate investigation",
+    "Critical - Urgent action required"
+]
+
+MODE_FULL = 'full'
+MODE_CLASSIFY = 'classify'
+
+# Budgets (in estimated tokens)
+MAX_TITLE_TOKENS = 50
+MAX_DESCRIPTION_TOKENS = 1500
+MAX_OUTPUT_TOKENS = {MODE_FULL: 600, MODE_CLASSIFY: 40}
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "\n[...]\n"
+
+# Fixed instruction sent once per model instead of being repeated in every prompt
+SYSTEM_INSTRUCTION = (
+    "You triage citizen grievances.\n"
+    f"Categories: {'; '.join(CATEGORIES)}\n"
+    f"Priorities: {'; '.join(PRIORITY_LEVELS)}\n"
+    "Always pick exactly one category and one priority from these lists, copied verbatim."
+)
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English text)"""
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_to_budget(text, max_tokens):
+    """
+    Fit text into a token budget by keeping its beginning and end, which carry
+    most of the context in long petitions, and dropping the middle.
+    """
+    text = text or ''
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text, False
+    
+    keep = max_chars - len(TRUNCATION_MARKER)
+    head = text[:keep * 2 // 3]
+    tail = text[-(keep - len(head)):]
+    return head.rstrip() + TRUNCATION_MARKER + tail.lstrip(), True
+
+def build_prompt(title, description, attachment_count=0, mode=MODE_FULL):
+    """
+    Build the per-request prompt for a grievance.
+    Returns (prompt, info) where info records the estimated input tokens and whether input was truncated.
+    """
+    title, title_truncated = truncate_to_budget(title or 'N/A', MAX_TITLE_TOKENS)
+    description, description_truncated = truncate_to_budget(description or 'N/A', MAX_DESCRIPTION_TOKENS)
+    
+    if mode == MODE_CLASSIFY:
+        prompt = f"""Title: {title}
+Description: {description}
+
+Reply with exactly two lines:
+Category: <category>
+Priority: <priority>"""
+    else:
+        prompt = f"""Title: {title}
+Description: {description}
+Attachments: {attachment_count} file(s)
+
+Reply in this format:
+Title: [Refined Title]
+Description: [Improved Description, at most 150 words]
+Category: [Category]
+Priority: [Priority]
+Rationale: [One sentence each for category and priority]
+Key Observations:
+1. [Observation]
+2. [Observation]
+3. [Observation]"""
+    
+    info = {
+        'mode': mode,
+        'estimated_input_tokens': estimate_tokens(SYSTEM_INSTRUCTION) + estimate_tokens(prompt),
+        'truncated': title_truncated or description_truncated
+    }
+    return prompt, info
+
+def generation_config(mode=MODE_FULL):
+    """Generation settings for a mode (caps output length)"""
+    return {'max_output_tokens': MAX_OUTPUT_TOKENS.get(mode, MAX_OUTPUT_TOKENS[MODE_FULL])}
+
+def usage_tokens(response, prompt, info):
+    """Actual (input, output) token counts from the response, falling back to estimates"""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    output_tokens = getattr(usage, 'candidates_token_count', None)
+    if prompt_tokens is None:
+        prompt_tokens = info['estimated_input_tokens']
+    if output_tokens is None:
+        output_tokens = estimate_tokens(getattr(response, 'text', ''))
+    return prompt_tokens, output_tokens
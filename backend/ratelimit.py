@@ -0,0 +1,159 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import jsonify, make_response, request
+
+# Admission control: per-user / per-IP token buckets plus per-process concurrency
+# limits for each route class. Requests over a limit are rejected immediately
+# (429 for rate limits, 503 for concurrency) with a Retry-After header.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'sqlite' (shared by workers)
+RATE_LIMIT_DATABASE = os.getenv('RATE_LIMIT_DATABASE', 'rate_limits.db')
+# How often idle buckets are dropped. A bucket left alone until it has refilled is the same
+# as no bucket, so stores forget those instead of keeping one per client ever seen.
+BUCKET_SWEEP_SECONDS = float(os.getenv('RATE_LIMIT_SWEEP_SECONDS', 60))
+
+# rate is tokens per second, burst is the bucket size, concurrency the in-flight cap per worker
+ROUTE_LIMITS = {
+    'ai': {'rate': 0.2, 'burst': 5, 'concurrency': 4},
+    'auth': {'rate': 0.5, 'burst': 10, 'concurrency': 8},
+    'read': {'rate': 10, 'burst': 50, 'concurrency': 32},
+}
+# Seconds the slowest of these buckets takes to refill from empty
+MAX_REFILL_SECONDS = max(limits['burst'] / limits['rate'] for limits in ROUTE_LIMITS.values())
+
+class MemoryStore:
+    """In-process token buckets (one set per worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._refill_seconds = MAX_REFILL_SECONDS
+        self._swept = time.monotonic()
+
+    def _sweep(self, now):
+        idle_since = now - self._refill_seconds
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[1] > idle_since}
+        self._swept = now
+
+    def take(self, key, rate, burst, cost=1):
+        """Take `cost` tokens. Returns (allowed, seconds until enough tokens are available)."""
+        now = time.monotonic()
+        with self._lock:
+            self._refill_seconds = max(self._refill_seconds, burst / rate)
+            if now - self._swept >= BUCKET_SWEEP_SECONDS:
+                self._sweep(now)
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0
+            self._buckets[key] = (tokens, now)
+            return False, (cost - tokens) / rate
+
+class SQLiteStore:
+    """Token buckets in a shared SQLite file so all worker processes enforce one limit"""
+
+    def __init__(self, path):
+        self._path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+        self._refill_seconds = MAX_REFILL_SECONDS
+        self._swept = time.time()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            self._refill_seconds = max(self._refill_seconds, burst / rate)
+            if now - self._swept >= BUCKET_SWEEP_SECONDS:
+                # Each worker sweeps on its own schedule; buckets idle past any refill time are full
+                conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - self._refill_seconds,))
+                self._swept = now
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return (True, 0) if allowed else (False, (cost - tokens) / rate)
+
+_store = None
+_store_lock = threading.Lock()
+_semaphores = {name: threading.BoundedSemaphore(limits['concurrency']) for name, limits in ROUTE_LIMITS.items()}
+
+def set_store(store):
+    """Install a custom bucket store (any object with a compatible take() method)"""
+    global _store
+    _store = store
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteStore(RATE_LIMIT_DATABASE) if RATE_LIMIT_BACKEND == 'sqlite' else MemoryStore()
+    return _store
+
+def _reject(status, message, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def rate_limited(route_class, per_user=False):
+    """
+    Apply the limits of a route class. With per_user=True the decorated view must
+    receive the user as its first argument (i.e. sit below @token_required);
+    otherwise requests are keyed by client IP.
+    """
+    limits = ROUTE_LIMITS[route_class]
+    semaphore = _semaphores[route_class]
+    
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+            
+            client = f"user:{args[0]['id']}" if per_user else f"ip:{request.remote_addr}"
+            allowed, retry_after = get_store().take(f"{route_class}:{client}", limits['rate'], limits['burst'])
+            if not allowed:
+                return _reject(429, "Too many requests", retry_after)
+            
+            if not semaphore.acquire(blocking=False):
+                return _reject(503, "Server busy, please retry", 1)
+            try:
+                response = make_response(f(*args, **kwargs))
+            except BaseException:
+                semaphore.release()
+                raise
+            
+            if response.is_streamed:
+                # Streamed list bodies run their queries while being sent, so the permit is held until the response closes
+                response.call_on_close(semaphore.release)
+            else:
+                semaphore.release()
+            return response
+        
+        return decorated
+    return decorator
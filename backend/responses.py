@@ -0,0 +1,144 @@
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from flask import Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+# Use orjson when it is installed, otherwise fall back to the standard library encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Brotli is optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Buffered JSON responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+# Fields stored as integer epoch milliseconds and returned as ISO 8601 strings
+TIMESTAMP_FIELDS = {'created_at', 'updated_at', 'due_at'}
+
+def iso_timestamp(epoch_ms):
+    """Format epoch milliseconds as an ISO 8601 UTC string"""
+    moment = datetime.fromtimestamp(epoch_ms / 1000, timezone.utc)
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def format_timestamps(obj):
+    """Recursively replace epoch-ms timestamp fields with ISO strings (API boundary only)"""
+    if isinstance(obj, dict):
+        return {key: iso_timestamp(value) if key in TIMESTAMP_FIELDS and isinstance(value, (int, float))
+                else format_timestamps(value)
+                for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [format_timestamps(item) for item in obj]
+    return obj
+
+class ApiJSONProvider(DefaultJSONProvider):
+    """jsonify() provider that formats timestamps on the way out"""
+
+    def dumps(self, obj, **kwargs):
+        return super().dumps(format_timestamps(obj), **kwargs)
+
+def dumps(obj):
+    """Serialize an object to a JSON string with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return _encoder.encode(obj)
+
+def stream_json_list(key, items, extra=None):
+    """
+    Generate a JSON object of the form {"<key>": [...], **extra} chunk by chunk,
+    so the list is written out as it is read from the cursor
+    """
+    yield '{' + dumps(key) + ':['
+    
+    first = True
+    for item in items:
+        if first:
+            yield dumps(format_timestamps(item))
+            first = False
+        else:
+            yield ',' + dumps(format_timestamps(item))
+    
+    yield ']'
+    for extra_key, extra_value in (extra or {}).items():
+        yield ',' + dumps(extra_key) + ':' + dumps(format_timestamps(extra_value))
+    yield '}'
+
+def json_list_response(key, items, status=200, extra=None):
+    """Build a streamed JSON response for a (possibly large) iterable of rows"""
+    return Response(
+        stream_with_context(stream_json_list(key, items, extra)),
+        status=status,
+        mimetype='application/json'
+    )
+
+def format_sse(data, event=None, event_id=None):
+    """Format one Server-Sent Events message. `data` must be a single-line string."""
+    message = ''
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    if event:
+        message += f'event: {event}\n'
+    return message + f'data: {data}\n\n'
+
+def _negotiate_encoding():
+    """Pick the best content encoding the client accepts, or None"""
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(supported)
+
+def _compressor(encoding):
+    """Return (compress, finish) callables for the given content encoding"""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 produces a gzip container
+    return compressor.compress, compressor.flush
+
+def compress_response(response):
+    """
+    after_request hook that gzip/brotli-compresses JSON responses.
+    Streamed responses are compressed on the fly; buffered ones only above COMPRESSION_MIN_SIZE.
+    """
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate_encoding()
+    if not encoding:
+        return response
+    
+    compress, finish = _compressor(encoding)
+    
+    if response.is_streamed:
+        chunks = response.response
+        
+        def generate():
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compress(chunk)
+                if data:
+                    yield data
+            yield finish()
+        
+        response.response = generate()
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress(data) + finish())
+    
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,103 @@
+"""
+Production server: pre-forked gunicorn workers, each serving requests on a thread pool.
+
+    python server.py [--bind HOST:PORT] [--workers N] [--threads N] [--timeout SECONDS]
+
+Options default to the WEB_BIND, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT and
+WEB_GRACEFUL_TIMEOUT environment variables. The master runs schema setup once, in a
+child process, before forking, so workers never race on migrations and the master
+never imports application modules; each worker then imports the app and opens its
+own database connections and in-memory state.
+
+Thread budget per worker: --threads for regular requests plus EVENT_MAX_STREAMS for
+live event streams (/api/events), each of which holds a thread while it is open.
+
+Send SIGHUP to the master for a graceful reload (new workers load fresh code,
+old ones finish their in-flight requests) and SIGTERM for a graceful shutdown.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+
+DEFAULT_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+DEFAULT_WORKERS = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count()))
+DEFAULT_THREADS = int(os.getenv('WEB_THREADS', 8))
+# Extra threads reserved for event streams; the same variable caps open streams per worker in events.py
+STREAM_THREADS = int(os.getenv('EVENT_MAX_STREAMS', 32))
+# Silence (in seconds) after which the master restarts a worker. gthread workers report from their
+# main loop, so a long request or open event stream does not trip it
+DEFAULT_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 60))
+DEFAULT_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+
+def run_setup():
+    """
+    Schema setup and migrations in a fresh interpreter, so the master never imports application
+    modules and workers forked after a reload import current code
+    """
+    # Same working directory as the workers (the database path is relative), with this directory importable
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [backend_dir, os.getenv('PYTHONPATH')])))
+    subprocess.run([sys.executable, '-c', 'import db; db.init_db()'], env=env, check=True)
+
+def on_starting(server):
+    """Master, before any worker is forked: schema setup and migrations run exactly once"""
+    run_setup()
+
+def on_reload(server):
+    """Master, on SIGHUP: apply any new migrations before the new workers start"""
+    run_setup()
+
+def post_fork(server, worker):
+    """Worker, right after fork: open this process's own database access"""
+    import db
+    db.init_worker()
+
+def load_app():
+    """Worker: import the application and build its per-process state"""
+    from app import create_app
+    return create_app(run_setup=False)
+
+def build_options(args):
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads + STREAM_THREADS,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        # Each worker imports the app itself so SIGHUP reloads pick up new code
+        'preload_app': False,
+        'on_starting': on_starting,
+        'on_reload': on_reload,
+        'post_fork': post_fork,
+        'accesslog': '-',
+    }
+
+def run(options):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("gunicorn is required for the production server: pip install gunicorn")
+        sys.exit(1)
+
+    class GrievanceServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+    GrievanceServer().run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the grievance API with pre-forked workers")
+    parser.add_argument('--bind', default=DEFAULT_BIND)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help="threads for regular requests (EVENT_MAX_STREAMS more are added for event streams)")
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--graceful-timeout', type=int, default=DEFAULT_GRACEFUL_TIMEOUT)
+    run(build_options(parser.parse_args()))
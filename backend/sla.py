@@ -0,0 +1,107 @@
+import os
+import threading
+import assignment
+import db
+
+# SLA escalation. Every open grievance carries a due_at deadline derived from its priority
+# (db.sla_due_at) in a partial index that holds only open work. The scheduler sleeps until
+# the earliest deadline, escalates whatever is overdue in deadline order and goes back to
+# sleep, so it never scans the table. Each worker may run one: escalations are claimed
+# atomically in db.escalate_grievance, so a deadline is only ever escalated once.
+SLA_SCHEDULER_ENABLED = os.getenv('SLA_SCHEDULER', '1') == '1'
+# Upper bound on a sleep, so deadlines set through other worker processes are picked up
+SLA_MAX_SLEEP_SECONDS = float(os.getenv('SLA_MAX_SLEEP_SECONDS', 60))
+SLA_BATCH_SIZE = int(os.getenv('SLA_BATCH_SIZE', 200))
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+_pid = None
+_next_due = None
+
+def next_priority(priority):
+    """The priority one level up, in the stored vocabulary (db.PRIORITY_LEVELS); unchanged at the top"""
+    level = db.priority_level(priority)
+    if level not in db.PRIORITY_LEVELS or level == db.PRIORITY_LEVELS[-1]:
+        return priority
+    return db.PRIORITY_LEVELS[db.PRIORITY_LEVELS.index(level) + 1]
+
+def _reassign_target(grievance):
+    """Least-loaded staff member of the submitter's department other than the current assignee"""
+    for staff in assignment.department_loads(grievance['submitter_department']):
+        if staff['id'] != grievance['assigned_to']:
+            return staff['id']
+    return None
+
+def escalate(grievance, now):
+    """
+    Escalate one overdue grievance: raise its priority a level, or once it is already at
+    the top (or has no assignee) hand it to the least-loaded other staff member.
+    It then gets a fresh deadline for its new priority. Returns the updated row or None.
+    """
+    priority = next_priority(grievance['priority'])
+    assigned_to = grievance['assigned_to']
+    if priority == grievance['priority'] or not assigned_to:
+        assigned_to = _reassign_target(grievance) or assigned_to
+    
+    updated = db.escalate_grievance(grievance['id'], grievance['due_at'], priority, assigned_to,
+                                    db.sla_due_at(priority, now))
+    if updated:
+        assignment.grievance_changed(grievance, updated)
+    return updated
+
+def run_once(now=None):
+    """Escalate every grievance whose deadline has passed. Returns the number escalated."""
+    now = now or db.now_ms()
+    escalated = 0
+    # Each grievance is escalated at most once per pass, even if its new deadline is already due
+    handled = set()
+    while True:
+        due = db.get_due_grievances(now, SLA_BATCH_SIZE)
+        pending = [grievance for grievance in due if grievance['id'] not in handled]
+        for grievance in pending:
+            handled.add(grievance['id'])
+            if escalate(grievance, now):
+                escalated += 1
+        if len(due) < SLA_BATCH_SIZE or not pending:
+            return escalated
+
+def _sleep_seconds():
+    global _next_due
+    _next_due = db.get_next_due_at()
+    if _next_due is None:
+        return SLA_MAX_SLEEP_SECONDS
+    return min(max((_next_due - db.now_ms()) / 1000.0, 0), SLA_MAX_SLEEP_SECONDS)
+
+def _run():
+    while True:
+        try:
+            escalated = run_once()
+            if escalated:
+                print(f"Escalated {escalated} overdue grievance(s)")
+            timeout = _sleep_seconds()
+        except Exception as e:
+            print(f"SLA scheduler error: {e}")
+            timeout = SLA_MAX_SLEEP_SECONDS
+        _wake.wait(timeout)
+        _wake.clear()
+
+def start():
+    """Start this process's scheduler thread (threads do not survive fork, so once per worker)"""
+    global _thread, _pid
+    with _lock:
+        if _thread is None or _pid != os.getpid():
+            _pid = os.getpid()
+            _thread = threading.Thread(target=_run, name='sla-scheduler', daemon=True)
+            _thread.start()
+
+def notify(due_at):
+    """Wake the scheduler early when a deadline earlier than the one it is sleeping towards appears"""
+    if due_at is not None and (_next_due is None or due_at < _next_due):
+        _wake.set()
+
+# Usage: python sla.py  (one escalation pass, e.g. from cron when the scheduler thread is disabled)
+if __name__ == "__main__":
+    db.init_db()
+    assignment.rebuild()
+    print(f"Escalated {run_once()} overdue grievance(s)")
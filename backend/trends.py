@@ -0,0 +1,49 @@
+import numpy as np
+
+# Trend series built from the daily_rollups table. Rollup rows are scattered into dense
+# (series x day) matrices and resampled to weekly or monthly buckets with a single
+# np.add.reduceat over the bucket boundaries, so a year of data is a few small arrays.
+INTERVALS = ('day', 'week', 'month')
+
+def _bucket_starts(days, interval):
+    """Bucket start date for every day (weeks start on Monday, months on the 1st)"""
+    if interval == 'day':
+        return days
+    if interval == 'week':
+        # 1970-01-01 was a Thursday, so Monday-aligned weeks are offset by three days
+        return days - (days.astype(np.int64) + 3) % 7
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+def build_series(rows, start_day, end_day, interval='day'):
+    """
+    Turn rollup rows ({day, key, opened, closed}) covering [start_day, end_day) into
+    per-bucket series. Days without activity count as zero; the range must not be empty.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of: {', '.join(INTERVALS)}")
+    
+    days = np.arange(start_day, end_day).astype('datetime64[D]')
+    keys = sorted({row['key'] for row in rows}, key=str)
+    key_index = {key: i for i, key in enumerate(keys)}
+    
+    opened = np.zeros((len(keys), len(days)), dtype=np.int64)
+    closed = np.zeros((len(keys), len(days)), dtype=np.int64)
+    if rows:
+        series = np.fromiter((key_index[row['key']] for row in rows), dtype=np.int64, count=len(rows))
+        offsets = np.fromiter((row['day'] - start_day for row in rows), dtype=np.int64, count=len(rows))
+        np.add.at(opened, (series, offsets), [row['opened'] for row in rows])
+        np.add.at(closed, (series, offsets), [row['closed'] for row in rows])
+    
+    starts = _bucket_starts(days, interval)
+    # Days are consecutive, so each bucket is the contiguous run of days sharing a start date
+    boundaries = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    opened = np.add.reduceat(opened, boundaries, axis=1)
+    closed = np.add.reduceat(closed, boundaries, axis=1)
+    
+    return {
+        "interval": interval,
+        "buckets": [str(start) for start in starts[boundaries]],
+        "series": [{"key": key, "opened": opened[i].tolist(), "closed": closed[i].tolist()}
+                   for i, key in enumerate(keys)],
+        "totals": {"opened": opened.sum(axis=0).tolist(), "closed": closed.sum(axis=0).tolist()},
+    }